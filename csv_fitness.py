@@ -11,12 +11,12 @@ def parseargs():
     parser.add_argument('--beta', help="Get Beta instead of peak stress", action='store_true')
     return parser.parse_args()
 
-def get_props_array(fname, base_props):
+def get_props_array(fname, sys):
     with open(fname) as fdesc:
         pr_arr = []
         cs_dict = csv.DictReader(fdesc, delimiter=',')
         for row in cs_dict:
-            prop = deepcopy(base_props)
+            prop = sys.base_props_list()
             prop[0][3] = to_nas_real(float(row['Top Flange Width']))
             prop[1][3] = to_nas_real(float(row['Bottom Flange Width']))
             prop[2][3] = to_nas_real(float(row['Web Thickness']))
@@ -42,7 +42,7 @@ else:
     fit_index = 0
     fit_sign = 1
 print(sys.base_props)
-props_array = get_props_array(fname, sys.base_props)
+props_array = get_props_array(fname, sys)
 fit = sys.run_generation(deepcopy,props_array)
 for x in fit:
     print(fit_sign * x.fitness[fit_index])
@@ -0,0 +1,156 @@
+'''
+End-to-end Benchmark
+
+Purpose: Time whole optimizations against fake_nastran.py, to measure the
+         Python-side cost of each solver evaluation apart from solver time.
+         Three workload shapes are run:
+           gen -- gen_case: systems under uniform random loads, for every
+                  population size and system count given.
+           loc -- loc_run: one unit load system, for every population size.
+           dwu -- dwu_run: many systems of the smallest population under
+                  normally distributed loads, for every system count given.
+                  Every drawn load case is kept, where dwu_run only keeps
+                  those above its minimum force, so the system count is exact.
+
+         Orchestration overhead is the wall time of a run less the solver
+         time it would take with every solver slot kept busy, per solver
+         job. The CPU time of the main Python phases is also given per job.
+
+Usage:   python e2e_benchmark.py models/test_open.dat --sizes 8 16 --systems 2 8
+'''
+from contextlib import redirect_stdout
+from time import time
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import pyequalizer as pe
+from numpy.random import default_rng
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_per_job = ['deck', 'parse', 'fitness', 'selection', 'pareto']
+
+def parseargs():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark against a fake solver')
+    parser.add_argument('fname', help='Base input deck')
+    parser.add_argument('--workloads', nargs='+', default=['gen', 'loc', 'dwu'],
+            choices=['gen', 'loc', 'dwu'], help='Workload shapes to run')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[4, 8],
+            help='Population sizes')
+    parser.add_argument('--systems', nargs='+', type=int, default=[2, 4],
+            help='System counts')
+    parser.add_argument('--n_gen', '-g', type=int, default=1,
+            help='Trial generations per system')
+    parser.add_argument('--latency', type=float, default=0.,
+            help='Seconds the fake solver sleeps per job')
+    parser.add_argument('--jobs', '-j', type=int, help='Concurrent solver jobs per system')
+    parser.add_argument('--parallel-systems', '-P', type=int, default=1,
+            help='Number of systems optimized at the same time')
+    parser.add_argument('--unit-subcases', default=False, action='store_true',
+            help='Run loc with both unit loads in one deck')
+    parser.add_argument('--binary', default=os.path.join(_here, 'fake_nastran.py'),
+            help='Solver executable')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--max-overhead', type=float,
+            help='Exit with an error if any run has more overhead per job than this, in ms')
+    return parser.parse_args()
+
+def gen_systems(args, n_ind, n_sys, sys_args):
+    starting_force = pe.read_force(pe.load_from_file(args.fname))
+    force_packs = pe.uniform_random_force(starting_force, n_sys)
+    return [pe.system(x, args.fname, 1, n_ind, [pe.cost_mass, pe.cost_stress],
+        [pe.const_beta, pe.const_mass], binary=args.binary, force=force_packs[x],
+        seed=x, **sys_args) for x in range(n_sys)]
+
+def loc_systems(args, n_ind, n_sys, sys_args):
+    return [pe.system_unit(1, args.fname, 1, n_ind, pe.test_open_force_pack(1,1000,0,0),
+        pe.test_open_force_pack(1,0,1000,0), pe.nr_var(0,5000), pe.nr_var(150000,19500),
+        binary=args.binary, seed=1, unit_subcases=args.unit_subcases, **sys_args)]
+
+def dwu_systems(args, n_ind, n_sys, sys_args):
+    starting_force = pe.read_force(pe.load_from_file(args.fname))
+    rng = default_rng(0)
+    loads = [pe.rnd_to_actual(f, a) for f, a in
+            zip(rng.normal(150000, 20670, n_sys), rng.normal(0, 0.087, n_sys))]
+    force_packs = pe.random_force_base(starting_force,
+            [[l[0] for l in loads], [l[1] for l in loads]], n_sys)
+    return [pe.system(x, args.fname, 1, n_ind, [pe.cost_mass, pe.cost_stress],
+        [pe.const_beta, pe.const_mass], binary=args.binary, force=force_packs[x],
+        seed=x, **sys_args) for x in range(n_sys)]
+
+_workloads = {'gen': gen_systems, 'loc': loc_systems, 'dwu': dwu_systems}
+
+def cases(args):
+    """
+    [workload, n_ind, n_sys] of every run.
+    """
+    out = []
+    for w in args.workloads:
+        if w == 'gen':
+            out += [[w, n, s] for n in args.sizes for s in args.systems]
+        elif w == 'loc':
+            out += [[w, n, 1] for n in args.sizes]
+        else:
+            out += [[w, min(args.sizes), s] for s in args.systems]
+    return out
+
+def run_case(args, workload, n_ind, n_sys):
+    root = tempfile.mkdtemp(prefix='pyequalizer-bench-')
+    try:
+        executor = pe.solver_executor(args.jobs)
+        sys_args = {'executor': executor, 'scratch': pe.scratch_space(root)}
+        systems = _workloads[workload](args, n_ind, n_sys, sys_args)
+        metrics = pe.run_metrics()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            start = time()
+            pe.optimize_systems(systems, args.n_gen, n_parallel=args.parallel_systems,
+                    metrics=metrics)
+            wall = time() - start
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    recs = metrics.records
+    jobs = sum(r['solver_jobs'] for r in recs)
+    slots = executor.n_workers
+    if min(args.parallel_systems, n_sys) > 1:
+        # Parallel systems share one limit of solver jobs, the CPU count. 
+        slots = min(slots * min(args.parallel_systems, n_sys), os.cpu_count() or 1)
+    solver = sum(r['solver_busy'] for r in recs) / slots
+    row = {'workload': workload, 'n_ind': n_ind, 'n_sys': n_sys, 'jobs': jobs,
+            'wall': wall, 'solver': solver, 'slots': slots,
+            'overhead_ms': 1000 * (wall - solver) / max(jobs, 1)}
+    for p in _per_job:
+        row[p + '_ms'] = 1000 * sum(r[p + '_cpu'] for r in recs) / max(jobs, 1)
+    return row
+
+def print_table(rows):
+    cols = (['workload', 'n_ind', 'n_sys', 'jobs', 'wall', 'solver', 'overhead_ms'] +
+            [p + '_ms' for p in _per_job])
+    print(" ".join("{:>12s}".format(c) for c in cols))
+    for r in rows:
+        print(" ".join("{:>12}".format(r[c]) if isinstance(r[c], (int, str))
+            else "{:12.3f}".format(r[c]) for c in cols))
+
+def main():
+    args = parseargs()
+    os.environ['FAKE_NASTRAN_LATENCY'] = str(args.latency)
+    args.fname = os.path.abspath(args.fname)
+    rows = []
+    for workload, n_ind, n_sys in cases(args):
+        print("Running {} with {} individuals and {} systems".format(workload, n_ind, n_sys),
+                file=sys.stderr)
+        rows.append(run_case(args, workload, n_ind, n_sys))
+    print_table(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'latency': args.latency, 'n_gen': args.n_gen, 'runs': rows}, f, indent=1)
+    if args.max_overhead is not None:
+        worst = max(r['overhead_ms'] for r in rows)
+        if worst > args.max_overhead:
+            print("Overhead of {:.3f} ms per job is over the limit of {:.3f} ms".format(
+                worst, args.max_overhead), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
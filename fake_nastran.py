@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+'''
+Fake Nastran
+
+Purpose: Stand-in for the solver binary, for benchmarks and checks on machines
+         without Nastran. Run as "fake_nastran.py deck.dat", it writes
+         deck.dat.out in the current directory in the layout pyequalizer
+         reads: a mass block and one CQUAD4 stress table per subcase, with
+         a row for the centre and each corner of every CQUAD4 in the deck,
+         at both fibres. Stresses are simple functions of the applied FORCE
+         cards and each element's PSHELL thickness, so designs and loads
+         still change the results.
+
+         Set FAKE_NASTRAN_LATENCY to a number of seconds to sleep before
+         writing, to stand in for the solve time.
+'''
+import math
+import os
+import re
+import sys
+import time
+
+_rows_per_page = 50
+_density = 1.7 # Mass per unit of summed PSHELL thickness.
+
+def nas_real(s):
+    """
+    Read a Nastran small field real, including the 1.5+5 exponent shorthand.
+    """
+    s = s.strip()
+    for i in range(len(s) - 1, 0, -1):
+        if s[i] in '+-' and s[i-1] not in 'eE':
+            return float(s[:i]) * 10**int(s[i:])
+    return float(s)
+
+def read_deck(lines):
+    """
+    Returns [cases, elements, thickness]: (subcase, fx, fy, labelled) for each
+    subcase, sorted [eid, pid] of the CQUAD4 cards, and PSHELL thickness by pid.
+    """
+    subcases = []
+    forces = {}
+    elements = []
+    thickness = {}
+    current = None
+    bulk = False
+    for l in lines:
+        u = l.strip().upper()
+        if u.startswith('BEGIN'):
+            bulk = True
+        if not bulk:
+            m = re.match(r'SUBCASE\s+(\d+)', u)
+            if m:
+                current = [int(m.group(1)), None]
+                subcases.append(current)
+            m = re.match(r'LOAD\s*=\s*(\d+)', u)
+            if m and current is not None:
+                current[1] = int(m.group(1))
+        elif l.startswith('PSHELL'):
+            thickness[int(l[8:16])] = float(l[24:32])
+        elif l.startswith('CQUAD4'):
+            elements.append([int(l[8:16]), int(l[16:24])])
+        elif l.startswith('FORCE'):
+            sid = int(l[8:16])
+            f = nas_real(l[32:40])
+            fx, fy = forces.get(sid, (0., 0.))
+            forces[sid] = (fx + f * nas_real(l[40:48]), fy + f * nas_real(l[48:56]))
+    if len(subcases) == 0:
+        total = (sum(v[0] for v in forces.values()), sum(v[1] for v in forces.values()))
+        cases = [(1, total[0], total[1], False)]
+    else:
+        cases = [(sc, *forces.get(sid, (0., 0.)), True) for sc, sid in subcases]
+    return [cases, sorted(elements), thickness]
+
+def stress_rows(elements, thickness, fx, fy):
+    """
+    Lines of a CQUAD4 stress table under load (fx, fy).
+    """
+    rows = []
+    for eid, pid in elements:
+        t = thickness.get(pid) or 0.1
+        for g, grid in enumerate(["CEN/4", "1", "2", "3", "4"]):
+            for fib in (-0.5, 0.5):
+                sx = (fx * (1 + eid % 7) + fy * 0.3) / (t * 100) * (1 + fib * 0.1 + g * 0.01)
+                sy = (fy * (1 + eid % 5) + fx * 0.2) / (t * 100) * (1 - fib * 0.1)
+                txy = (fx + fy) / (t * 300) * (1 + g * 0.02)
+                c = (sx + sy) / 2
+                r = math.sqrt(((sx - sy) / 2)**2 + txy**2)
+                s1, s2 = c + r, c - r
+                vm = math.sqrt(s1 * s1 - s1 * s2 + s2 * s2)
+                first = g == 0 and fib < 0
+                rows.append("{}{}{}{:13.6E}{:13.6E}  {:13.6E}  {:13.6E}{:14.4f}{:13.6E}   {:13.6E}{:14.6E}".format(
+                    "0" if fib < 0 else " ", "{:8d}".format(eid) if first else " " * 8,
+                    "{:>8s}".format(grid) if fib < 0 else " " * 8,
+                    fib, sx, sy, txy, 12.0, s1, s2, vm))
+    return rows
+
+def f06_lines(cases, elements, thickness):
+    """
+    Lines of the output file.
+    """
+    mass = sum(thickness.values()) * _density
+    out = [" " * 20 + "1    NX NASTRAN STATIC        PAGE     1",
+           " " * 47 + "MASS AXIS SYSTEM (S)     MASS",
+           " " * 41 + "{:15.6E}".format(mass).replace('E', 'D')]
+    header = (" " * 18 + "S T R E S S E S   I N   G E N E R A L   " +
+            "Q U A D R I L A T E R A L   E L E M E N T S")
+    page = 2
+    for sc, fx, fy, labelled in cases:
+        rows = stress_rows(elements, thickness, fx, fy)
+        for p in range(0, len(rows), _rows_per_page):
+            if labelled:
+                out.append("0" + " " * 108 + "SUBCASE {}".format(sc))
+            out.append(header)
+            out += [" ", "  ELEMENT  ", "    ID  ", " "]
+            out += rows[p:p + _rows_per_page]
+            out.append(" " * 90 + "PAGE {}".format(page))
+            page += 1
+    return out
+
+def main(deck):
+    with open(deck) as f:
+        lines = f.read().splitlines()
+    latency = float(os.environ.get("FAKE_NASTRAN_LATENCY", 0))
+    if latency > 0:
+        time.sleep(latency)
+    out = f06_lines(*read_deck(lines))
+    with open(os.path.basename(deck) + ".out", "w") as f:
+        f.write("\n".join(out) + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1])
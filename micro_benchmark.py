@@ -0,0 +1,176 @@
+'''
+Microbenchmarks
+
+Purpose: Time and peak memory of the routines run for every generation (deck
+         parsing and writing, Nastran real conversion, F06 reading, pareto
+         extraction and the stochastic stress of a tensor_ind) on generated
+         inputs of increasing size, printed as a scaling table.
+
+         Each routine is timed as the best of --repeat calls. Peak memory is
+         the largest amount allocated through Python (numpy included) during
+         one more call, traced with tracemalloc. The exponent column fits
+         time ~ n**k between each size and the one before it.
+
+Usage:   python micro_benchmark.py [--only read_cards isolate_pareto] [--scale 0.1]
+'''
+from math import log
+from time import perf_counter
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from numpy.random import default_rng
+from pyequalizer.fileops import *
+from pyequalizer.results import read_f06
+from pyequalizer.optim import isolate_pareto, tensor_ind
+from pyequalizer import test_open_force_pack
+from pyequalizer.population import Population
+from pyequalizer.nr_var import nr_var
+import fake_nastran
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_model = os.path.join(_here, 'models', 'test_open.dat')
+
+def deck_lines(n):
+    """
+    A bulk data deck of n PSHELL cards, each with a continuation line, and n CQUAD4 cards.
+    """
+    lines = ["SOL 101\n", "CEND\n", "BEGIN BULK\n"]
+    for i in range(1, n + 1):
+        lines.append(format_card(["PSHELL", str(i), "1", "{:.1f}".format(10. + i % 200), "1",
+            "", "1", "", "0.", "", "", "2.2", "11."]))
+        lines.append(format_card(["CQUAD4", str(i), str(i), str(i), str(i + 1),
+            str(i + 2), str(i + 3)]))
+    lines.append("ENDDATA\n")
+    return "".join(lines).splitlines(keepends = True)
+
+def f06_file(n, path):
+    """
+    Write an F06 file with stress tables for n CQUAD4 elements. Returns its name.
+    """
+    elements = [[e, 1 + e % 5] for e in range(1, n + 1)]
+    thickness = {p: 10. * p for p in range(1, 6)}
+    fname = os.path.join(path, 'bench-{}.f06'.format(n))
+    with open(fname, 'w') as f:
+        f.write("\n".join(fake_nastran.f06_lines([(1, 1000., -150000., False)],
+            elements, thickness)) + "\n")
+    return fname
+
+def max_von_mises(line, loc, retval):
+    try:
+        return max(retval, to_von_mises(line[87:100], line[103:116]))
+    except ValueError:
+        return retval
+
+def setup_tensor_ind(n):
+    rng = default_rng(0)
+    ind = tensor_ind([], 0, test_open_force_pack(1,1000,0,0), test_open_force_pack(1,0,1000,0),
+            rng.normal(0, 100, (n, 3)), rng.normal(0, 100, (n, 3)), 1., list(range(1, n + 1)),
+            list(range(n)))
+    return [ind, nr_var(0, 5000), nr_var(150000, 19500)]
+
+def setup_population(n):
+    rng = default_rng(0)
+    base = [["PSHELL", "1", "1", "1.0"]]
+    return Population(rng.uniform(0, 250, (n, 1)), base, 0, rng.uniform(0, 1, (n, 2)),
+            rng.uniform(0, 1, (n, 2)))
+
+def benchmarks(tmp):
+    """
+    [name, sizes, setup(n), run(args)] of every benchmark.
+    """
+    template = deck_template(load_from_file(_model))
+    props = read_properties(load_from_file(_model))
+    def decks(n):
+        names = [os.path.join(tmp, 'bench-{}.dat'.format(i)) for i in range(n)]
+        return [[props] * n, names]
+    return [
+        ['split_bulk', [1000, 10000, 100000], deck_lines,
+            lambda lines: [split_bulk(l) for l in lines]],
+        ['read_cards', [1000, 10000, 100000], deck_lines,
+            lambda lines: read_cards(lines, is_prop_header)],
+        ['strip_card', [1000, 10000, 100000], deck_lines,
+            lambda lines: strip_card(lines, is_prop_header)],
+        ['to_nas_real', [1000, 10000, 100000],
+            lambda n: default_rng(0).uniform(-1e6, 1e6, n).tolist(),
+            lambda vals: [to_nas_real(v) for v in vals]],
+        ['from_nas_real', [1000, 10000, 100000],
+            lambda n: [to_nas_real(v) for v in default_rng(0).uniform(1, 1e6, n).tolist()],
+            lambda vals: [from_nas_real(v) for v in vals]],
+        ['inject_cards', [100, 1000, 10000],
+            lambda n: [[["PSHELL", str(i), "1", "1.0"] for i in range(n)],
+                load_from_file(_model)],
+            lambda a: inject_cards(*a)],
+        ['multi_file_out', [10, 100, 500], decks,
+            lambda a: multi_file_out(a[0], template, None, a[1])],
+        ['act_on_stress_lines', [100, 1000, 10000], lambda n: f06_file(n, tmp),
+            lambda fname: act_on_stress_lines(fname, max_von_mises)],
+        ['mass', [100, 1000, 10000], lambda n: f06_file(n, tmp), mass],
+        ['read_f06', [100, 1000, 10000], lambda n: f06_file(n, tmp), read_f06],
+        ['isolate_pareto', [100, 1000, 10000], setup_population, isolate_pareto],
+        ['apply_stochastic_force', [100, 1000, 10000], setup_tensor_ind,
+            lambda a: a[0].apply_stochastic_force(a[1], a[2])],
+    ]
+
+def measure(setup, run, n, repeat):
+    """
+    [best seconds, peak bytes] of run(setup(n)).
+    """
+    args = setup(n)
+    best = None
+    for r in range(repeat):
+        start = perf_counter()
+        run(args)
+        t = perf_counter() - start
+        best = t if best is None else min(best, t)
+    tracemalloc.start()
+    run(args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return [best, peak]
+
+def parseargs():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the per-generation hot paths')
+    parser.add_argument('--only', nargs='+', help='Names of the benchmarks to run')
+    parser.add_argument('--scale', type=float, default=1.,
+            help='Factor applied to every input size')
+    parser.add_argument('--repeat', '-r', type=int, default=5,
+            help='Timed calls per size; the best is kept')
+    parser.add_argument('--json', help='Write the results to this file')
+    return parser.parse_args()
+
+def main():
+    args = parseargs()
+    tmp = tempfile.mkdtemp(prefix = 'pyequalizer-micro-')
+    rows = []
+    try:
+        for name, sizes, setup, run in benchmarks(tmp):
+            if args.only and name not in args.only:
+                continue
+            last = None
+            for n in sorted(set(max(1, int(s * args.scale)) for s in sizes)):
+                print("Running {} at n = {}".format(name, n), file = sys.stderr)
+                t, peak = measure(setup, run, n, args.repeat)
+                k = None
+                if last is not None and last[1] > 0 and t > 0:
+                    k = log(t / last[1]) / log(n / last[0])
+                rows.append({'benchmark': name, 'n': n, 'seconds': t, 'per_item_us': 1e6 * t / n,
+                    'peak_bytes': peak, 'exponent': k})
+                last = [n, t]
+    finally:
+        shutil.rmtree(tmp, ignore_errors = True)
+    print("{:<24s}{:>8s}{:>12s}{:>14s}{:>14s}{:>10s}".format(
+        'benchmark', 'n', 'time (ms)', 'per item (us)', 'peak (KiB)', 'exponent'))
+    for r in rows:
+        print("{:<24s}{:>8d}{:>12.3f}{:>14.3f}{:>14.1f}{:>10s}".format(r['benchmark'], r['n'],
+            1e3 * r['seconds'], r['per_item_us'], r['peak_bytes'] / 1024,
+            '' if r['exponent'] is None else '{:.2f}'.format(r['exponent'])))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent = 1)
+
+if __name__ == '__main__':
+    main()
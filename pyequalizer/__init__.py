@@ -1,10 +1,16 @@
 from pyequalizer.fileops import *
+from pyequalizer.results import *
 from pyequalizer.optim import *
 from pyequalizer.regression import *
 from pyequalizer.nr_var import *
 from pyequalizer.nas_utils import *
+from pyequalizer.checkpoint import *
+from pyequalizer.metrics import *
 from matplotlib.pyplot import ioff, savefig, subplots
 from multiprocessing.pool import Pool
+from multiprocessing import BoundedSemaphore
+import numpy
+import os
 import sys, getopt
 import random 
 from time import time
@@ -24,22 +30,22 @@ def test_open_force_pack(f, n1,n2,n3):
     pack = [to_nas_force(2,918,0,f,n1,n2,n3)] 
     return pack
 
-def cost_stress(files):
+def cost_stress(results):
     """
-    cost_stress(self, files): Categorize the organisms in a generation by cost based on max stress
+    cost_stress(results): Categorize the organisms in a generation by cost based on max stress
 
     Arguments: 
-    files: List of nastran input decks. 
+    results: List of f06_result objects, one per organism. 
     """
-    return [max_cquad_stress(f + ".out") for f in files]
+    return [r.max_stress for r in results]
 
-def cost_mass(files):
+def cost_mass(results):
     """
-    cost_mass(files): Categorize organisms by mass. 
+    cost_mass(results): Categorize organisms by mass. 
     """
-    return [mass(f+".out") for f in files]
+    return [r.mass for r in results]
 
-def const_beta(files):
+def const_beta(results):
     """
     Categorize organisms by reliability index. 
     """
@@ -47,32 +53,27 @@ def const_beta(files):
         mu_strength = 250
         sigma_strength = 32.5
         return (mu_strength - stress) / ((sigma_strength) ** 2 + (0)**2)**0.5
-    stresses = cost_stress(files)
+    stresses = cost_stress(results)
     betas = [min(beta(st)-4, 0)*-10**4 for st in stresses]
     return betas
 
-def const_mass(files):
-    masses = cost_mass(files)
+def const_mass(results):
+    masses = cost_mass(results)
     ms_out = [min(1000 - x, 0) * -10**4 for x in masses]
     return(ms_out)
 
-def converge_check_pareto_percentage(latest_front, last_front, latest_vec, i):
+def converge_check_pareto_percentage(archive, latest_vec, i):
     threshold = 0.5
-    percentage = len(latest_front)/len(latest_vec)
+    percentage = len(archive)/len(latest_vec)
     print("CONVERGENCE PROGRESS: Threshold: {} Current: {}".format(threshold, percentage))
     converged = True if percentage >= threshold else False
     return [converged, i]
 
-def converge_check_change_percentage(latest_front, last_front, latest_vec, ctr):
+def converge_check_change_percentage(archive, latest_vec, ctr):
     threshold = 0.9
     counter_threshold = 10
-    def intersection(lst1, lst2): 
-        # Use of hybrid method 
-        temp = set(lst2) 
-        lst3 = [value for value in lst1 if value in temp] 
-        return lst3 
-    similarity = len(intersection(latest_front, last_front))
-    sim_ratio = similarity/(len(latest_front)/2 + len(last_front) /2)
+    similarity = archive.kept
+    sim_ratio = similarity/(len(archive)/2 + archive.last_size /2)
     print("CONVERGENCE PROGRESS: Threshold: {} Current: {}".format(threshold, sim_ratio))
     if sim_ratio >= threshold:
         if ctr >= counter_threshold:
@@ -161,15 +162,28 @@ def plot_with_front(gen, front, title, fname):
     fig.savefig(fname)
     return [fig, ax]
 
-def no_validate(inds, val_force, fname, max_wt, max_stress):
+def no_validate(inds, val_force, fname, max_wt, max_stress, **sys_args):
     """
     Do not perform FEM validation. Used on solutions with more traditional constraints. 
     """
     return inds
 
-def validate_inds(inds, val_force, fname, max_wt, max_stress):
-    val_sys = system(99,fname,1,0,[cost_mass, cost_stress], [const_beta], force = val_force)
-    val_inds = val_sys.dummy_generation(inds)
+def validate_inds(inds, val_force, fname, max_wt, max_stress, **sys_args):
+    """
+    Keep the designs that meet the weight and stress limits under val_force. 
+    sys_args are passed on to the validation system (cache, executor, scratch). 
+    The validation system gets a scratch_space of its own next to the run's, as
+    its system number may also be that of a system of the run. 
+    """
+    run_scratch = sys_args.get('scratch')
+    if run_scratch is not None:
+        sys_args = dict(sys_args, scratch = scratch_space(run_scratch.root, run_scratch.keep))
+    val_sys = system(99,fname,1,0,[cost_mass, cost_stress], [const_beta], force = val_force, 
+            **sys_args)
+    try:
+        val_inds = val_sys.dummy_generation(inds)
+    finally:
+        val_sys.scratch.cleanup()
     valid_designs = []
     for x in range(len(val_inds)):
         if val_inds[x].fitness[0] < max_wt and val_inds[x].fitness[1] < max_stress:
@@ -237,12 +251,111 @@ def parseargs():
         parser.add_argument('--convergence', '-C', help='Add convergence check NUM to the algorithm. Supported values: 1-pareto percentage convergence', type=int)
         parser.add_argument('--csv',default=False, action='store_true', 
                 help='Output final systems as a CSV file.')
+        parser.add_argument('--cache', help='Directory of the solver result cache. Disabled if not given.')
+        parser.add_argument('--cache-size', type=int, default=10000, 
+                help='Maximum number of solver results kept in the cache')
+        parser.add_argument('--jobs', '-j', type=int, 
+                help='Number of concurrent solver jobs. Defaults to the CPU count.')
+        parser.add_argument('--timeout', type=float, 
+                help='Seconds before a solver job is killed. No limit if not given.')
+        parser.add_argument('--retries', type=int, default=0, 
+                help='Number of times a failed solver job is retried')
+        parser.add_argument('--scratch', default='/tmp/nastran', 
+                help='Directory under which solver scratch directories are made')
+        parser.add_argument('--keep-scratch', default=False, action='store_true', 
+                help='Keep solver input and output files after each generation')
+        parser.add_argument('--seed', type=int, 
+                help='Seed for the evolution operators. System N uses SEED + N.')
+        parser.add_argument('--parallel-systems', '-P', type=int, default=1, 
+                help='Number of systems optimized at the same time')
+        parser.add_argument('--solver-slots', type=int, 
+                help='Maximum solver jobs running at once over all parallel systems. Defaults to the CPU count.')
+        parser.add_argument('--stress-workers', type=int, 
+                help='Worker processes for the stochastic stress evaluation of large generations. In-process if not given, or when systems run in parallel (-P > 1).')
+        parser.add_argument('--unit-subcases', default=False, action='store_true', 
+                help='Solve both unit loads of a location run in one deck, as two subcases')
+        parser.add_argument('--surrogate', default=False, action='store_true', 
+                help='Skip solving trial vectors a Gaussian process model predicts will lose selection')
+        parser.add_argument('--surrogate-threshold', type=float, default=0.05, 
+                help='Smallest predicted probability of winning selection for a trial to be solved')
+        parser.add_argument('--surrogate-explore', type=float, default=0.1, 
+                help='Fraction of screened-out trials solved anyway')
+        parser.add_argument('--archive-size', type=int, 
+                help='Capacity of the pareto archive kept for each system. Defaults to --n_ind.')
+        parser.add_argument('--checkpoint', 
+                help='Directory to save the state of each system to after every generation. Disabled if not given.')
+        parser.add_argument('--resume', default=False, action='store_true', 
+                help='Continue the run saved in --checkpoint, skipping finished systems and generations')
+        parser.add_argument('--metrics', 
+                help='Write the time spent in each phase of every generation to this file, as CSV if it ends in .csv and JSON otherwise')
         parser.add_argument('fname') 
         args = parser.parse_args()
         return args
     except:
         raise()
 
+def make_cache(args):
+    """
+    Build the solver result cache requested on the command line, if any. 
+    """
+    if getattr(args, 'cache', None):
+        return run_cache(args.cache, max_entries = args.cache_size)
+    return None
+
+def make_executor(args):
+    """
+    Build the solver executor described by the command line. 
+    """
+    return solver_executor(getattr(args, 'jobs', None), getattr(args, 'timeout', None), 
+            getattr(args, 'retries', 0))
+
+def make_sys_args(args):
+    """
+    Build the solver-related keyword arguments shared by every system of a run. 
+    """
+    return {'cache': make_cache(args), 'executor': make_executor(args), 
+            'scratch': scratch_space(getattr(args, 'scratch', '/tmp/nastran'), 
+                getattr(args, 'keep_scratch', False))}
+
+def make_checkpoint(args):
+    """
+    Build the checkpoint store requested on the command line, if any. 
+    """
+    if getattr(args, 'checkpoint', None):
+        return checkpoint_store(args.checkpoint, getattr(args, 'resume', False))
+    if getattr(args, 'resume', False):
+        raise ValueError("--resume requires --checkpoint")
+    return None
+
+def make_metrics(args):
+    """
+    Build a run_metrics if --metrics was given, else None. 
+    """
+    return run_metrics() if getattr(args, 'metrics', None) else None
+
+def write_metrics(args, metrics):
+    """
+    Write the phase timings of a run to the file given with --metrics. 
+    """
+    if metrics is not None:
+        metrics.write(args.metrics)
+        print("Phase timings written to {}".format(args.metrics))
+
+def make_surrogate(args):
+    """
+    Build a surrogate for one system if --surrogate was given, else None. 
+    """
+    if getattr(args, 'surrogate', False):
+        return gp_surrogate(args.surrogate_threshold, args.surrogate_explore)
+    return None
+
+def system_seed(args, x):
+    """
+    Seed for system x, derived from the --seed argument. None if no seed was given. 
+    """
+    seed = getattr(args, 'seed', None)
+    return None if seed is None else seed + x
+
 def gen_case(args, force_func, val_func):
     N_GEN = args.n_gen           # Number of generations per system. 
     N_IND = args.n_ind           # Number of individuals per system. 
@@ -250,80 +363,196 @@ def gen_case(args, force_func, val_func):
     MAX_WT = args.max_wt         # Max Weight
     MAX_STRESS = args.max_stress # Max Stress
     fname = args.fname
+    sys_args = make_sys_args(args)
+    checkpoint = make_checkpoint(args)
 
     # Pull force parameters to randomize
     file_lines = load_from_file(fname)
     starting_force = read_force(file_lines)
-    #Generate random forces
-    force_packs = force_func(starting_force, N_SYS)
+    #Generate random forces, or reuse those of the run being resumed. 
+    force_packs = checkpoint.load('forces') if checkpoint is not None else None
+    if force_packs is None:
+        force_packs = force_func(starting_force, N_SYS)
+        if checkpoint is not None:
+            checkpoint.save('forces', force_packs)
     
     systems = [system(x,fname, 1,N_IND, [cost_mass, cost_stress], 
-        [const_beta, const_mass], force = force_packs[x]) for x in range(len(force_packs))]
-
-    all_front = optimize_systems(systems, N_GEN, converged_func = args.conv_func)
-    val_func_closed = lambda x: val_func(x, starting_force, fname, MAX_WT, MAX_STRESS)
+        [const_beta, const_mass], force = force_packs[x], seed = system_seed(args, x), 
+        surrogate = make_surrogate(args), **sys_args) 
+        for x in range(len(force_packs))]
+
+    metrics = make_metrics(args)
+    all_front = optimize_systems(systems, N_GEN, converged_func = args.conv_func, 
+            n_parallel = args.parallel_systems, solver_slots = args.solver_slots, 
+            archive_size = args.archive_size, checkpoint = checkpoint, metrics = metrics)
+    write_metrics(args, metrics)
+    val_func_closed = lambda x: val_func(x, starting_force, fname, MAX_WT, MAX_STRESS, **sys_args)
     if (args.csv == False):
         prepare_report_pretty(all_front, val_func_closed, systems)
     else:
         prepare_report_csv(all_front, val_func_closed, systems)
+    sys_args['scratch'].cleanup()
 
-def optimize_systems(systems, N_GEN, compact=False, converged_func= lambda a,b,c,d: False):
+def never_converged(archive, latest_vec, ctr):
     """
-    Main optimization loop for the program. 
+    Default convergence check: always run every generation. 
+    """
+    return [False, ctr]
+
+def optimize_system(main_sys, x, N_GEN, compact=True, converged_func=never_converged, 
+        start_time=None, archive_size=None, checkpoint=None, metrics=None):
+    """
+    Optimize a single system, then plot and pickle its results. 
     Inputs:
-      systems   -- List of pyequalizer.optim.system objects that make up the load cases to be analyzed.
-      N_GEN     -- Number of generations to run each optimization for.
+      main_sys  -- The pyequalizer.optim.system object to optimize. 
+      x         -- Index of the system, used in progress messages and output file names. 
+      N_GEN     -- Number of generations to run the optimization for.
+      compact   -- Drop the unit load stresses of the returned front, keeping only 
+                   designs and fitness. Set False to keep them for further analysis. 
+      archive_size -- Capacity of the pareto archive kept across generations. 
+                   Defaults to the number of organisms per generation. 
+      checkpoint -- Optional checkpoint_store the state of the system is saved to 
+                   after every generation. When resuming, the system carries on from 
+                   its saved state, or returns its saved front if it had finished. 
+      metrics   -- Optional run_metrics the phases of every generation are timed into. 
     Output: 
-      all_front -- A sorted list of pareto fronts from each system, presented as an
-                   array of arrays of pyequalizer.optim.Ind objects. 
+      front     -- The pareto front found over all generations, as a list of 
+                   pyequalizer.optim.Ind objects. 
     """
+    if start_time is None:
+        start_time = time()
     def gen_loop(x,i, last_vec):
         print("Generation {} in system {} starting at T+ {:.3f}".format(i, x, time()-start_time))
         latest_vec = main_sys.trial_generation(last_vec)
-        latest_props = [a.props for a in latest_vec]
-        latest_cost = [a.fitness[0] for a in latest_vec]
-        min_cost = min(latest_cost)
+        min_index = int(numpy.argmin(latest_vec.fitness[:, 0]))
 
         #If any cost values come out to be zero, complain. 
-        if min(latest_cost) == 0:
+        if latest_vec.fitness[min_index, 0] == 0:
             s = "One or more cost values are zero.\n"
-            min_index = latest_cost.index(min_cost)
-            min_prop = latest_props[min_index]
             s += "At index {}\n".format(min_index)
-            for x in min_prop:
+            for x in latest_vec.props(min_index):
                 s += "{}\n".format(str(x))
             raise ValueError(s)
         print("Generation {} in system {} complete at T+ {:.3f}\n".format(i, x, time()-start_time))
         return latest_vec
-    print("Analysis Started.")
-    start_time = time()
-    all_front = []
-    #Main analysis loop.
-    for x in range(len(systems)):
-        main_sys = systems[x]
+    main_sys.metrics = metrics
+    key = system_key(x)
+    state = checkpoint.load(key) if checkpoint is not None else None
+    if state is not None and state['done']:
+        print("System {} loaded from checkpoint".format(x))
+        return state['front']
+    if state is not None:
+        latest_vec, archive, start_gen, ctr = restore_system(main_sys, state)
+        print("System {} resumed from checkpoint at generation {}".format(x, start_gen))
+    else:
+        if metrics is not None:
+            metrics.begin(x, 0)
+        archive = pareto_archive(main_sys.n_org if archive_size is None else archive_size)
         latest_vec = main_sys.first_generation()
-        last_front = []
-        latest_front = isolate_pareto(latest_vec)
-        ctr = 0
-        for i in range(N_GEN):
-            last_front = latest_front
-            latest_vec = gen_loop(x,i,latest_vec)
-            latest_front = isolate_pareto(latest_vec)
-            converged, ctr = converged_func(latest_front, last_front, latest_vec, ctr)
-            if converged:
-                print("Convergence Achieved")
-                break
-        #Plot results of this system
-        front = latest_front
+        with timed(metrics, 'pareto'):
+            archive.update(latest_vec)
+        start_gen, ctr = 0, 0
+        if checkpoint is not None:
+            with timed(metrics, 'checkpoint'):
+                checkpoint.save(key, system_state(main_sys, latest_vec, archive, start_gen, ctr))
+    surrogate = getattr(main_sys, 'surrogate', None)
+    for i in range(start_gen, N_GEN):
+        if metrics is not None:
+            metrics.begin(x, i + 1)
+        n_screened = len(surrogate.history) if surrogate is not None else 0
+        latest_vec = gen_loop(x,i,latest_vec)
+        if surrogate is not None and len(surrogate.history) > n_screened:
+            h = surrogate.history[-1]
+            print("Surrogate in system {}: solved {} of {} trials ({} explored), {} of {} outcomes predicted, MAE {:.3f}".format(
+                x, h['solved'], h['trials'], h['explored'], h['correct'], h['solved'], h['mae']))
+        with timed(metrics, 'pareto'):
+            archive.update(latest_vec)
+        print("Pareto archive of system {}: {} members, {} added, {} removed".format(
+            x, len(archive), archive.added, archive.removed))
+        converged, ctr = converged_func(archive, latest_vec, ctr)
+        if checkpoint is not None:
+            next_gen = N_GEN if converged else i + 1
+            with timed(metrics, 'checkpoint'):
+                checkpoint.save(key, system_state(main_sys, latest_vec, archive, next_gen, ctr))
+        if converged:
+            print("Convergence Achieved")
+            break
+    #Plot results of this system
+    if metrics is not None:
+        metrics.begin(x, None)
+    front = archive.front()
+    with timed(metrics, 'plot'):
         fig , ax = plot_with_front(latest_vec, front, 'System {}'.format(str(x)) 
                 ,'/tmp/output_sys_' + str(x) + '.png')
         with open('/tmp/output_sys_' + str(x) + '.pickle', 'wb') as f:
             pickle.dump(fig,f)
             pickle.dump(ax,f)
-        if (compact):
-            for x in front:
-                x.strip_tensors()
-        all_front.append(front)
+    if (compact):
+        for ind in front:
+            if hasattr(ind, 'strip_tensors'):
+                ind.strip_tensors()
+    if checkpoint is not None:
+        with timed(metrics, 'checkpoint'):
+            checkpoint.save(key, {'done': True, 'front': front})
+    if metrics is not None:
+        metrics.end()
+        print(metrics.report(x))
+    return front
+
+def _init_system_worker(slots):
+    """
+    Pool initializer for optimize_systems. Shares the global solver slots and 
+    gives each worker its own global random state, which forked workers would 
+    otherwise share. 
+    """
+    set_solver_slots(slots)
+    random.seed()
+    numpy.random.seed()
+
+def _optimize_system_star(args):
+    """
+    Unpack the arguments of optimize_system for Pool.imap. Returns the front and 
+    the metrics records added while optimizing it, since in a worker process the 
+    run_metrics is a copy. 
+    """
+    metrics = args[-1]
+    n = len(metrics.records) if metrics is not None else 0
+    front = optimize_system(*args)
+    return [front, metrics.records[n:] if metrics is not None else []]
+
+def optimize_systems(systems, N_GEN, compact=True, converged_func=never_converged, 
+        n_parallel=1, solver_slots=None, archive_size=None, checkpoint=None, metrics=None):
+    """
+    Main optimization loop for the program. 
+    Inputs:
+      systems   -- List of pyequalizer.optim.system objects that make up the load cases to be analyzed.
+      N_GEN     -- Number of generations to run each optimization for.
+      compact   -- See optimize_system. 
+      n_parallel -- Number of systems optimized at once, each in its own process. 
+      solver_slots -- Maximum number of solver jobs running at once over all systems. 
+                      Only used when n_parallel > 1. Defaults to the CPU count. 
+      archive_size -- Capacity of each system's pareto archive. Defaults to the 
+                      number of organisms per generation. 
+      checkpoint -- Optional checkpoint_store, see optimize_system. 
+      metrics   -- Optional run_metrics collecting the phase timings of every system. 
+    Output: 
+      all_front -- A sorted list of pareto fronts from each system, presented as an
+                   array of arrays of pyequalizer.optim.Ind objects. 
+    """
+    print("Analysis Started.")
+    start_time = time()
+    jobs = [(systems[x], x, N_GEN, compact, converged_func, start_time, archive_size, 
+            checkpoint, metrics) for x in range(len(systems))]
+    if n_parallel <= 1:
+        return [_optimize_system_star(a)[0] for a in jobs]
+    all_front = []
+    slots = BoundedSemaphore(solver_slots if solver_slots else (os.cpu_count() or 1))
+    with Pool(n_parallel, initializer=_init_system_worker, initargs=(slots,)) as pool:
+        for x, [front, records] in enumerate(pool.imap(_optimize_system_star, jobs, chunksize=1)):
+            print("System {} complete at T+ {:.3f}".format(x, time()-start_time))
+            if metrics is not None:
+                metrics.records.extend(records)
+            all_front.append(front)
     return all_front
 
 def prepare_report_pretty(all_front, val_func, systems):
@@ -437,14 +666,26 @@ def loc_run(args):
     file_lines = load_from_file(fname)
     starting_force = read_force(file_lines)
     
+    sys_args = make_sys_args(args)
+    stress_pool = stochastic_pool(args.stress_workers) if args.stress_workers else None
     systems = [system_unit(1,fname, 1,N_IND,  
-               x_force, y_force, sto_force_x, sto_force_y)]
-    all_front = optimize_systems(systems, N_GEN, converged_func=args.conv_func)
+               x_force, y_force, sto_force_x, sto_force_y, seed = system_seed(args, 1), 
+               stress_pool = stress_pool, unit_subcases = args.unit_subcases, 
+               surrogate = make_surrogate(args), **sys_args)]
+    metrics = make_metrics(args)
+    all_front = optimize_systems(systems, N_GEN, converged_func=args.conv_func, 
+            n_parallel = args.parallel_systems, solver_slots = args.solver_slots, 
+            archive_size = args.archive_size, checkpoint = make_checkpoint(args), 
+            metrics = metrics)
+    write_metrics(args, metrics)
     val_closed = lambda x: no_validate(x,[],[],[],[])
     if (args.csv == False):
         prepare_report_pretty(all_front, val_closed, systems)
     else:
         prepare_report_csv(all_front, val_closed, systems)
+    sys_args['scratch'].cleanup()
+    if stress_pool is not None:
+        stress_pool.close()
 def main():
     args = parseargs()
     if args.convergence:
@@ -454,7 +695,7 @@ def main():
                 }
         args.conv_func  = conv_funcs[args.convergence]
     else:
-        args.conv_func = lambda a,b,c,d:False
+        args.conv_func = never_converged
     if args.special:
         cases = {
                 1: det_run,
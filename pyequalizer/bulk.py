@@ -0,0 +1,169 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Bulk
+  Purpose: Indexed model of the cards in a NASTRAN input deck, built in a
+           single pass over the deck's lines.
+"""
+from pyequalizer.fileops import split_bulk, needs_cont
+
+def parse_nas_real(string):
+    """
+    parse_nas_real(string): Read a NASTRAN real field. Accepts plain floats,
+    E or D exponents and the short forms 1.5+5 and 1.5-5.
+    """
+    s = string.strip().upper().replace('D', 'E')
+    if 'E' not in s:
+        for j in range(len(s) - 1, 0, -1):
+            if s[j] in '+-':
+                s = s[:j] + 'E' + s[j:]
+                break
+    return float(s)
+
+class card(object):
+    """
+    Class 'card'
+
+    A single bulk data card, including its continuation lines.
+
+    Properties:
+    fields: Fields of the card as 8 character strings with spaces removed,
+            as returned by split_bulk. Fields of continuation lines are
+            appended after the header fields.
+    start: Index of the card's first line in the deck.
+    stop: Index one past the card's last line in the deck.
+    name: Card type, e.g. PSHELL.
+    id: The card's ID (second field) as an int, or None if it has none.
+    """
+    def __init__(self, fields, start, stop):
+        self.fields = fields
+        self.start = start
+        self.stop = stop
+
+    @property
+    def name(self):
+        return self.fields[0]
+
+    @property
+    def id(self):
+        try:
+            return int(self.fields[1])
+        except (IndexError, ValueError):
+            return None
+
+    def field(self, i, default = ''):
+        """
+        field(i, default): Field i as a string, or default if the card is shorter or the field is blank.
+        """
+        try:
+            return self.fields[i] if self.fields[i] != '' else default
+        except IndexError:
+            return default
+
+    def int(self, i, default = None):
+        """
+        int(i, default): Field i as an int.
+        """
+        f = self.field(i)
+        return int(f) if f != '' else default
+
+    def real(self, i, default = None):
+        """
+        real(i, default): Field i as a float.
+        """
+        f = self.field(i)
+        return parse_nas_real(f) if f != '' else default
+
+    def __str__(self):
+        return str(self.fields)
+
+def bulk_span(lines):
+    """
+    bulk_span(lines): [start, stop) of the bulk data lines of a deck, i.e. the lines
+    after BEGIN BULK and before ENDDATA. A deck without BEGIN BULK is all bulk data.
+    """
+    start = 0
+    stop = len(lines)
+    for j in range(len(lines)):
+        word = lines[j].strip().upper()
+        if word.startswith('BEGIN') and start == 0:
+            start = j + 1
+        elif word.startswith('ENDDATA'):
+            stop = j
+            break
+    return [start, stop]
+
+class bulk_deck(object):
+    """
+    Class 'bulk_deck'
+
+    Every card in the bulk data of an input deck, indexed by type and by
+    (type, ID). Executive and case control lines, and anything after
+    ENDDATA, are not cards. Cards keep the span of lines they came from, so
+    the deck can be written back out with some card types removed.
+
+    Properties:
+    lines: The deck as a list of lines.
+    cards: All cards in the order they appear.
+    by_type: Dictionary from card type to the cards of that type, in order.
+    by_id: Dictionary from (type, ID) to a card. The first card wins if an ID repeats.
+    """
+    def __init__(self, lines):
+        self.lines = lines
+        self.cards = []
+        self.by_type = {}
+        self.by_id = {}
+        current = None
+        start, stop = bulk_span(lines)
+        for j in range(start, stop):
+            line = lines[j]
+            if current is not None and needs_cont(lines[j-1]):
+                # Continuation of the card on the previous line.
+                current.stop = j + 1
+                if line[0:8].split() == ['+']:
+                    current.fields.extend(split_bulk(line)[1:])
+                continue
+            current = None
+            fields = split_bulk(line)
+            if len(fields) == 0 or fields[0] == '' or fields[0][0] in '$+*':
+                continue
+            current = card(fields, j, j + 1)
+            self.cards.append(current)
+            self.by_type.setdefault(current.name, []).append(current)
+            self.by_id.setdefault((current.name, current.id), current)
+
+    def get(self, name, id):
+        """
+        get(name, id): The card of a type with a given ID, or None.
+        """
+        return self.by_id.get((name, id))
+
+    def select(self, names):
+        """
+        select(names): All cards of the given types, in deck order.
+        """
+        found = []
+        for n in names:
+            found.extend(self.by_type.get(n, []))
+        return sorted(found, key = lambda c: c.start)
+
+    def fields(self, names):
+        """
+        fields(names): Copies of the field lists of every card of the given
+                       types, in deck order. Same output as read_cards.
+        """
+        return [list(c.fields) for c in self.select(names)]
+
+    def lines_without(self, names):
+        """
+        lines_without(names): The deck's lines with every card of the given types removed.
+        Same output as strip_card.
+        """
+        out = []
+        last = 0
+        for c in self.select(names):
+            out.extend(self.lines[last:c.start])
+            last = c.stop
+        out.extend(self.lines[last:])
+        return out
@@ -0,0 +1,133 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Cache
+  Purpose: On-disk cache of parsed solver results, keyed by the content of
+           the input deck that produced them.
+"""
+from collections import OrderedDict
+from hashlib import sha256
+import pickle
+import os
+
+# Puts between rescans of the cache directory. Processes sharing a cache only
+# see each other's entries on a rescan, so this bounds how far past its
+# limits the cache can grow.
+_rescan = 64
+
+class run_cache(object):
+    """
+    Class 'run_cache'
+
+    Content-addressed store of f06_result objects. Each entry is a pickle
+    named after the hash of the deck (and solver binary) that produced it.
+    Entries are evicted least-recently-used first, by modification time on
+    disk, once the cache grows past max_entries or max_bytes. Several
+    processes may share one directory; the limits apply to all of them.
+
+    Properties:
+    path: Directory holding the cache entries.
+    max_entries: Maximum number of entries kept. None for no limit.
+    max_bytes: Maximum total size of the entries in bytes. None for no limit.
+    hits, misses: Lookup counters for this instance.
+    """
+    def __init__(self, path, max_entries = 10000, max_bytes = None):
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+        self._index = OrderedDict()
+        self._bytes = 0
+        self._puts = 0
+        self.evict()
+
+    def _entry(self, key):
+        return os.path.join(self.path, key + '.pickle')
+
+    def key(self, deck, binary = ""):
+        """
+        key(deck, binary): Hash of an input deck's contents and the solver used on it.
+        deck may be a file name or the deck itself as bytes.
+        """
+        if not isinstance(deck, bytes):
+            with open(deck, 'rb') as f:
+                deck = f.read()
+        h = sha256(binary.encode())
+        h.update(b'\0')
+        h.update(deck)
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        get(key): Return the cached result for key, or None on a miss.
+        """
+        try:
+            with open(self._entry(key), 'rb') as f:
+                res = pickle.load(f)
+            os.utime(self._entry(key))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            self._index.pop(key, None)
+            return None
+        self.hits += 1
+        if key in self._index:
+            self._index.move_to_end(key)
+        return res
+
+    def put(self, key, result):
+        """
+        put(key, result): Store a result, evicting old entries if the cache is full.
+        """
+        tmp = self._entry(key) + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f)
+        size = os.path.getsize(tmp)
+        os.replace(tmp, self._entry(key))
+        self._bytes += size - self._index.pop(key, 0)
+        self._index[key] = size
+        self._puts += 1
+        if self._over() or self._puts >= _rescan:
+            self.evict()
+
+    def _over(self):
+        return ((self.max_entries is not None and len(self._index) > self.max_entries) or
+                (self.max_bytes is not None and self._bytes > self.max_bytes))
+
+    def _scan(self):
+        """
+        _scan(): Rebuild the index from the entries on disk, oldest first.
+        Other processes sharing the directory add and touch entries too, so
+        only the modification times on disk give the true usage order.
+        """
+        entries = []
+        with os.scandir(self.path) as it:
+            for x in it:
+                if x.name.endswith('.pickle'):
+                    try:
+                        st = x.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, x.name[:-7], st.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._bytes = sum(self._index.values())
+        self._puts = 0
+
+    def evict(self):
+        """
+        evict(): Remove least recently used entries until the cache is within its limits.
+        """
+        self._scan()
+        while self._over() and len(self._index) > 0:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(self._entry(key))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        self._scan()
+        return len(self._index)
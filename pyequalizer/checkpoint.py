@@ -0,0 +1,92 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Checkpoint
+  Purpose: Atomic on-disk snapshots of the optimization state, written after
+           every generation, so an interrupted run can be resumed without
+           solving again what was already solved.
+"""
+import pickle
+import os
+
+_version = 1 # Bumped when the layout of a saved state changes.
+
+def system_key(x):
+    """
+    system_key(x): Checkpoint key of system x.
+    """
+    return 'system_{}'.format(x)
+
+class checkpoint_store(object):
+    """
+    Class 'checkpoint_store'
+
+    Directory of pickled states, one file per key. Every save writes to a
+    temporary file in the same directory and renames it over the old one,
+    so a crash leaves either the previous state or the new one, never a
+    partial file.
+
+    States are only read back when resume is set; otherwise an existing
+    checkpoint is overwritten as the run progresses.
+
+    Properties:
+    path: Directory holding the checkpoint files.
+    resume: Whether load() returns saved states.
+    """
+    def __init__(self, path, resume = False):
+        self.path = path
+        self.resume = resume
+        os.makedirs(path, exist_ok = True)
+
+    def _file(self, key):
+        return os.path.join(self.path, '{}.ckpt'.format(key))
+
+    def save(self, key, state):
+        """
+        save(key, state): Atomically replace the state stored under key.
+        """
+        tmp = self._file(key) + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': _version, 'state': state}, f,
+                    protocol = pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file(key))
+
+    def load(self, key):
+        """
+        load(key): The state stored under key, or None if not resuming, if there
+                   is none, or if it was written by an incompatible version.
+        """
+        if not self.resume:
+            return None
+        try:
+            with open(self._file(key), 'rb') as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        if saved.get('version') != _version:
+            return None
+        return saved['state']
+
+def system_state(main_sys, latest_vec, archive, next_gen, ctr):
+    """
+    system_state(main_sys, latest_vec, archive, next_gen, ctr): Everything
+    optimize_system needs to carry on with generation next_gen of main_sys.
+    """
+    return {'done': False, 'next_gen': next_gen, 'ctr': ctr,
+            'population': latest_vec, 'archive': archive,
+            'rng': main_sys.rng.bit_generator.state,
+            'generation': main_sys.generation,
+            'surrogate': main_sys.surrogate}
+
+def restore_system(main_sys, state):
+    """
+    restore_system(main_sys, state): Put main_sys back in the state saved by
+    system_state. Returns [latest_vec, archive, next_gen, ctr].
+    """
+    main_sys.rng.bit_generator.state = state['rng']
+    main_sys.generation = state['generation']
+    main_sys.surrogate = state['surrogate']
+    return [state['population'], state['archive'], state['next_gen'], state['ctr']]
@@ -0,0 +1,50 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Evolve
+  Purpose: Differential evolution operators that act on a whole population
+           matrix at once.
+"""
+from numpy import arange, minimum, maximum, abs as np_abs, where
+
+def de_indices(n, rng):
+    """
+    de_indices(n, rng): Draw the two donor indices (j, k) used to mutate each of n
+                        individuals, such that i, j and k are all different.
+                        rng is a numpy.random.Generator. Needs n >= 3.
+    """
+    if n < 3:
+        raise ValueError("Differential evolution needs at least 3 individuals, got {}".format(n))
+    i = arange(n)
+    # j: uniform over every index but i.
+    j = (i + 1 + rng.integers(0, n - 1, n)) % n
+    # k: uniform over every index but i and j, by skipping over both.
+    lo = minimum(i, j)
+    hi = maximum(i, j)
+    k = rng.integers(0, n - 2, n)
+    k = k + (k >= lo)
+    k = k + (k >= hi)
+    return j, k
+
+def de_mutate(x, j, k, F):
+    """
+    de_mutate(x, j, k, F): Mutated vectors x + F * (x[j] - x[k]).
+    abs is taken because thickness cannot be negative in nastran.
+    """
+    return np_abs(x + F * (x[j] - x[k]))
+
+def de_crossover(x, v, CR, rng):
+    """
+    de_crossover(x, v, CR, rng): Take each gene from the mutated vector v with
+                                 probability CR, and from the parent x otherwise.
+    """
+    return where(rng.random(x.shape) > CR, x, v)
+
+def de_select(left_fitness, right_fitness):
+    """
+    de_select(left_fitness, right_fitness): True where the right individual
+                                            replaces the left one, i.e. where no
+                                            fitness value of left is lower.
+    """
+    return ~(left_fitness < right_fitness).any(axis=1)
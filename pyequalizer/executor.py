@@ -0,0 +1,188 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Executor
+  Purpose: Launching solver jobs with bounded concurrency, per-job timeouts
+           and retries, and reporting the jobs that failed. Jobs are driven
+           by an asyncio event loop so results can be processed as each job
+           completes while the rest are still running.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+import asyncio
+import os
+import signal
+
+_solver_slots = None # Process-shared semaphore limiting solver jobs over all processes.
+
+def set_solver_slots(slots):
+    """
+    set_solver_slots(slots): Share a multiprocessing semaphore that every 
+                             executor in this process holds while a solver job runs. 
+                             Used as a Pool initializer when systems run in parallel. 
+    """
+    global _solver_slots
+    _solver_slots = slots
+
+async def _kill(p):
+    """
+    Kill a solver process, and everything it started, and wait for it to exit. 
+    """
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await p.wait()
+
+class SolverError(Exception):
+    """
+    Raised when one or more solver jobs did not complete successfully.
+
+    Properties:
+    failed: List of job_result objects for the failed jobs.
+    """
+    def __init__(self, failed):
+        self.failed = failed
+        s = "{} solver job(s) failed:".format(len(failed))
+        for x in failed:
+            s += "\n  {}".format(x)
+        super().__init__(s)
+
+class job_result(object):
+    """
+    Class 'job_result'
+
+    Outcome of a single solver job.
+
+    Properties:
+    fname: Input deck that was run.
+    returncode: Exit code of the last attempt. None if the job never ran to completion.
+    attempts: Number of times the job was launched.
+    timed_out: True if the last attempt was killed for running past the timeout.
+    elapsed: Wall time of all attempts in seconds, not counting waits for a
+             solver slot shared with other processes.
+    error: Description of an error raised while launching, or of unusable
+           solver output, if any. A job with an error is not ok.
+    value: Return value of the completion callback given to solver_executor.run.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.returncode = None
+        self.attempts = 0
+        self.timed_out = False
+        self.elapsed = 0.
+        self.error = None
+        self.value = None
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and self.error is None
+
+    def __str__(self):
+        if self.error is not None:
+            why = self.error
+        elif self.timed_out:
+            why = "timed out"
+        else:
+            why = "return code {}".format(self.returncode)
+        return "{}: {} after {} attempt(s)".format(self.fname, why, self.attempts)
+
+class solver_executor(object):
+    """
+    Class 'solver_executor'
+
+    Runs the solver on a batch of input decks. Each job is its own solver
+    process, started in the directory of its deck and in a session of its
+    own, so that a job killed on timeout takes any processes the solver
+    started (e.g. by a "nastran" wrapper script) with it. At most n_workers
+    processes run at once.
+
+    Properties:
+    n_workers: Maximum number of concurrent solver processes. Defaults to the CPU count.
+    timeout: Seconds a job may run before it is killed. None for no limit.
+    retries: Number of extra attempts given to a failed job.
+    """
+    def __init__(self, n_workers = None, timeout = None, retries = 0):
+        self.n_workers = n_workers if n_workers else (os.cpu_count() or 1)
+        self.timeout = timeout
+        self.retries = retries
+
+    async def run_one(self, binary, fname, slots, validate = None):
+        """
+        run_one(binary, fname, slots, validate): Run the solver on a single deck, retrying on failure.
+        slots is an asyncio.Semaphore held while the solver process is alive. 
+        validate(job), if given, is called after each attempt that exits with code 0 
+        and returns a description of what is wrong with its output, or None. An 
+        attempt with bad output is retried like any other failure. 
+        """
+        res = job_result(fname)
+        path, name = os.path.split(fname)
+        async with slots:
+            while res.attempts <= self.retries:
+                res.attempts += 1
+                res.timed_out = False
+                res.returncode = None
+                res.error = None
+                if not os.path.isfile(fname):
+                    res.error = "File Not Found: {}".format(fname)
+                    break
+                if _solver_slots is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, _solver_slots.acquire)
+                start = time()
+                try:
+                    try:
+                        p = await asyncio.create_subprocess_exec(binary, name, 
+                                cwd = path if path else None, start_new_session = True)
+                    except OSError as e:
+                        res.error = str(e)
+                        continue
+                    # TimeoutError is an OSError from Python 3.11, so the wait
+                    # is kept apart from the launch. 
+                    try:
+                        res.returncode = await asyncio.wait_for(p.wait(), self.timeout)
+                    except asyncio.TimeoutError:
+                        await _kill(p)
+                        res.timed_out = True
+                    except asyncio.CancelledError:
+                        await _kill(p)
+                        raise
+                finally:
+                    res.elapsed += time() - start
+                    if _solver_slots is not None:
+                        _solver_slots.release()
+                if res.ok and validate is not None:
+                    res.error = await asyncio.get_running_loop().run_in_executor(
+                            None, validate, res)
+                if res.ok:
+                    break
+        return res
+
+    async def run_all(self, binary, files, on_complete = None, validate = None):
+        """
+        run_all(binary, files, on_complete, validate): Coroutine version of run. 
+        """
+        slots = asyncio.Semaphore(self.n_workers)
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(1) as post:
+            async def job(i, fname):
+                res = await self.run_one(binary, fname, slots, validate)
+                if on_complete is not None and res.ok:
+                    res.value = await loop.run_in_executor(post, on_complete, i, res)
+                return res
+            return await asyncio.gather(*[job(i, f) for i, f in enumerate(files)])
+
+    def run(self, binary, files, on_complete = None, validate = None):
+        """
+        run(binary, files, on_complete, validate): Run the solver on every deck in files.
+
+        on_complete(i, job) is called for each successful job as soon as it
+        finishes, while other jobs keep running. Calls are made one at a time
+        from a helper thread, and their return values are stored in job.value.
+        validate is described in run_one. 
+
+        Returns a job_result for each deck, in the same order as files.
+        """
+        if len(files) == 0:
+            return []
+        return asyncio.run(self.run_all(binary, files, on_complete, validate))
@@ -7,26 +7,21 @@
 # Date:   2018-07-12
 
 _valid_entries = ["PBAR", "PSHELL"]
+_stress_header = 'S T R E S S E S   I N   G E N E R A L   Q U A D R I L A T E R A L'
+_stress_width = 130 # Width of a CQUAD4 stress table row in the F06.
 import sys
 from copy import deepcopy
 from subprocess import Popen,call
 from pyequalizer.stress_tensor import stress_tensor
-from multiprocessing.pool import ThreadPool
+from pyequalizer.executor import solver_executor, SolverError, set_solver_slots
 from time import sleep
 from math import *
+from numpy import (frombuffer, maximum, minimum, arange, where, argmax, column_stack, uint8,
+        flatnonzero, concatenate, empty, zeros, full, array, searchsorted, repeat, cumsum,
+        unique, isin, split)
+from numpy.lib.stride_tricks import sliding_window_view
 import os
-
-class cd:
-    """Context manager for changing the current working directory"""
-    def __init__(self, newPath):
-        self.newPath = os.path.expanduser(newPath)
-
-    def __enter__(self):
-        self.savedPath = os.getcwd()
-        os.chdir(self.newPath)
-
-    def __exit__(self, etype, value, traceback):
-        os.chdir(self.savedPath)
+import re
 
 def to_nas_real(number):
     try:
@@ -80,21 +75,56 @@ def print_lines(lines,tgt):
     for x in lines:
         print(x, end="", file=tgt)
 
+def format_card(card):
+    """
+    format_card(card): Render a card, given as a list of fields, as small-field bulk data. 
+    Fields past the ninth go on a continuation line. 
+    """
+    newline = "{:<8s}".format(card[0])
+    limit = min(9,len(card))
+    for y in range(1, limit):
+        newline += "{:>8s}".format(card[y])
+    if len(card) > limit:
+        newline += "+\n+       "
+        for z in range(limit,len(card)):
+            newline += "{:>8s}".format(card[z])
+    return newline + '\n'
+
 def inject_cards(cards, lines):
-    my_lines = deepcopy(lines)
+    my_lines = list(lines)
     for x in cards:
-        newline = "{:<8s}".format(x[0])
-        limit = min(9,len(x))
-        for y in range(1, limit):
-            newline += "{:>8s}".format(x[y])
-        if len(x) > limit:
-            newline += "+\n+       "
-            for z in range(limit,len(x)):
-                newline += "{:>8s}".format(x[z])
-        newline += '\n'
-        my_lines.insert(-1, newline)
+        my_lines.insert(-1, format_card(x))
     return my_lines
 
+class deck_template(object):
+    """
+    Class 'deck_template'
+
+    A base input deck rendered to bytes once, so that each individual's deck
+    is written as prefix + cards + suffix in a single write. Cards go right
+    before the last line of the deck (ENDDATA), as with inject_cards. 
+
+    Properties:
+    head: Every line of the base deck but the last, as bytes. 
+    tail: The last line of the base deck, as bytes. 
+    """
+    def __init__(self, lines):
+        self.head = "".join(lines[:-1]).encode()
+        self.tail = "".join(lines[-1:]).encode()
+
+    def render(self, cards):
+        """
+        render(cards): The full deck with cards spliced in, as bytes. 
+        """
+        return b"".join([self.head, "".join([format_card(x) for x in cards]).encode(), self.tail])
+
+    def write(self, fname, cards):
+        """
+        write(fname, cards): Write the deck with cards spliced in to fname. 
+        """
+        with open(fname, 'wb') as f:
+            f.write(self.render(cards))
+
 def is_prop_header(line):
     try:
         if any(line[0] == x for x in _valid_entries):
@@ -156,37 +186,58 @@ def read_cards(lines_in, test_func):
             armed = False
     return property_names
 
-def multi_file_out(prop_sets, lines, prefix):
-    fnames = []
+def multi_file_out(prop_sets, lines, prefix, fnames = None):
+    """
+    multi_file_out(prop_sets, lines, prefix, fnames): Write one input deck per property set. 
+    lines is the base deck, either as a list of lines or as a deck_template. 
+    Decks are named prefix-sub-<i>.dat unless a list of file names is given in fnames. 
+    """
+    if fnames is None:
+        fnames = [prefix + "-sub-" + str(i) + ".dat" for i in range(len(prop_sets))]
+    template = lines if isinstance(lines, deck_template) else deck_template(lines)
     for i in range(len(prop_sets)):
-        fname = prefix + "-sub-" + str(i) + ".dat"
-        fnames.append(fname)
-        with open(fname, 'w') as f:
-            print_lines(inject_cards(prop_sets[i], lines), f)
+        template.write(fnames[i], prop_sets[i])
     return fnames
 
-def run_nastran(nastr_bin, files):
-    #print(nastr_bin)
-    def call_nas(eff):
-        split_path = os.path.split(eff)
-        if split_path[0] == '':
-            p = call([nastr_bin, split_path[1]])
-        else:
-            with cd(split_path[0]):
-                if os.path.isfile(split_path[1]):
-                    p = call([nastr_bin, split_path[1]])
-                else:
-                    raise IOError("File Not Found: {}".format(split_path[1]))
-        tmp = p.communicate()
-        
-    processes = ThreadPool(8)
-    res = []
-    for f in files:
-        res.append(processes.apply_async(call_nas, (f,)))
-    processes.close()
-    processes.join()
-    processes.terminate()
-        #sleep(3)
+def output_error(job):
+    """
+    output_error(job): What is wrong with the output file of a solver job that exited 
+    cleanly, or None if nothing is. 
+    """
+    try:
+        with open(job.fname + ".out", 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return "no output file"
+    if b'FATAL' in data:
+        return "fatal message in output"
+    return None
+
+def run_nastran(nastr_bin, files, executor = None, on_complete = None, validate = output_error):
+    """
+    run_nastran(nastr_bin, files, executor, on_complete, validate): Run the solver on every 
+    input deck in files. 
+
+    Parameters: 
+    nastr_bin: The binary for "nastran" or a compatible solver. 
+    files: List of input deck file names. 
+    executor: solver_executor controlling concurrency, timeouts and retries. 
+              A default one is used if not given. 
+    on_complete: Optional function called as on_complete(i, job) as soon as the
+                 job for files[i] succeeds, while other jobs are still running. 
+    validate: Check of the output of each job that exits cleanly, see 
+              solver_executor.run_one. Jobs with bad output are retried. Defaults 
+              to output_error. 
+
+    Returns the list of job_result objects. Raises SolverError if any job failed. 
+    """
+    if executor is None:
+        executor = solver_executor()
+    res = executor.run(nastr_bin, files, on_complete, validate)
+    failed = [x for x in res if not x.ok]
+    if len(failed) > 0:
+        raise SolverError(failed)
+    return res
 
 def skipline(f,n):
     for x in range(n):
@@ -229,46 +280,328 @@ def act_on_stress_lines(f06_fname, proc_func):
             print("ERROR: {}".format(e))
     return 1.0*10**10 # Return an absurdly high stress is the file isn't found or has failed.
 
+_stress_fields = {'fibre': (17,30), 'sx': (30,43), 'sy': (45,58), 'txy': (60,73),
+        'major': (87,100), 'minor': (103,116)}
+
+def line_offsets(data):
+    """
+    line_offsets(data): [starts, lens] arrays of the byte offset and length of every 
+    line in data (bytes), not counting line terminators. 
+    """
+    buf = frombuffer(data, dtype=uint8)
+    nl = flatnonzero(buf == 10)
+    starts = concatenate(([0], nl + 1))
+    ends = concatenate((nl, [len(data)]))
+    if not data or data.endswith(b'\n'):
+        starts, ends = starts[:-1], ends[:-1]
+    lens = ends - starts
+    cr = lens > 0
+    cr[cr] = buf[ends[cr] - 1] == 13
+    return [starts, lens - cr]
+
+def line_field(data, starts, lens, start, stop):
+    """
+    line_field(data, starts, lens, start, stop): Characters [start, stop) of the lines at 
+    starts (see line_offsets) as an array of bytes strings. Short lines are padded with blanks. 
+    """
+    width = stop - start
+    out = empty((len(starts), width), dtype=uint8)
+    wide = lens >= stop
+    if wide.any():
+        out[wide] = sliding_window_view(frombuffer(data, dtype=uint8), width)[starts[wide] + start]
+    for i in flatnonzero(~wide):
+        line = data[starts[i]:starts[i] + lens[i]]
+        out[i] = frombuffer(line[start:stop].ljust(width), dtype=uint8)
+    return out.view('S{}'.format(width)).ravel()
+
+def _stress_column(name):
+    start, stop = _stress_fields[name]
+    def get(self):
+        col = self._columns.get(name)
+        if col is None:
+            col = line_field(self._data, self._starts, self._lens, start, stop).astype(float)
+            self._columns[name] = col
+        return col
+    return property(get)
+
+class stress_table(object):
+    """
+    Class 'stress_table'
+
+    The CQUAD4 stress tables of an F06 file parsed into column arrays. 
+    Every row of the tables (both fibres, centre and corners) is kept, 
+    and rows are stored in the order they appear in the file. The stress 
+    columns are only decoded the first time they are used. 
+
+    Properties:
+    eid: Element ID owning each row. 
+    center: True for the rows that carry the element ID field, i.e. the first
+            line of each element. 
+    fibre: Fibre distance. 
+    sx, sy, txy: Stresses in the element coordinate system. 
+    major, minor: Principal stresses. 
+    loc: Raw element ID field of the first line of each row's line pair. 
+    """
+    fibre = _stress_column('fibre')
+    sx = _stress_column('sx')
+    sy = _stress_column('sy')
+    txy = _stress_column('txy')
+    major = _stress_column('major')
+    minor = _stress_column('minor')
+
+    def __init__(self, rows):
+        data = "\n".join(rows).encode()
+        self._load(data, *line_offsets(data))
+
+    @classmethod
+    def from_lines(cls, data, starts, lens):
+        """
+        from_lines(data, starts, lens): stress_table of the lines of data (bytes) at the 
+        offsets and lengths given by starts and lens. 
+        """
+        table = cls.__new__(cls)
+        table._load(data, starts, lens)
+        return table
+
+    def _load(self, data, starts, lens):
+        self._data = data
+        self._starts = starts
+        self._lens = lens
+        self._columns = {}
+        n = len(starts)
+        eid_field = line_field(data, starts, lens, 1, 9)
+        self.center = eid_field != b'        '
+        # Forward fill the element ID over the rows that leave it blank.
+        ids = zeros(n, dtype=int)
+        ids[self.center] = eid_field[self.center].astype(int)
+        owner = maximum.accumulate(where(self.center, arange(n), 0)) if n else arange(0)
+        self.eid = ids[owner]
+        self.loc = eid_field[arange(n) - arange(n) % 2]
+
+    def __getstate__(self):
+        # Decode every column so the F06 text does not travel with the table. 
+        for name in _stress_fields:
+            getattr(self, name)
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+    def __len__(self):
+        return len(self.eid)
+
+    def rows(self, start, stop):
+        """
+        rows(start, stop): A stress_table of rows [start, stop), sharing this table's arrays. 
+        """
+        part = stress_table.__new__(stress_table)
+        part._data = self._data
+        for name in ('_starts', '_lens', 'center', 'eid', 'loc'):
+            setattr(part, name, getattr(self, name)[start:stop])
+        part._columns = {k: v[start:stop] for k, v in self._columns.items()}
+        return part
+
+    @property
+    def von_mises(self):
+        return von_mises_array(self.major, self.minor)
+
+    @property
+    def center_stresses(self):
+        """
+        [sx, sy, txy] rows for the first line of each element, as returned by stress_all_point.
+        """
+        c = self.center
+        return [list(x) for x in zip(self.sx[c], self.sy[c], self.txy[c])]
+
+    @property
+    def center_voigt(self):
+        """
+        (n_elem, 3) array of [sx, sy, txy] for the first line of each element.
+        """
+        c = self.center
+        return column_stack((self.sx[c], self.sy[c], self.txy[c]))
+
+    @property
+    def center_eids(self):
+        """
+        Element ID of each row of center_voigt.
+        """
+        return self.eid[self.center]
+
+def find_stress_rows(data, elements = None):
+    """
+    find_stress_rows(data, elements): [starts, lens] of the lines of every CQUAD4 stress 
+    block in the text of an F06 (bytes), as given by line_offsets. A block starts 4 
+    lines after its header and is read in line pairs until a pair starts on a PAGE 
+    line or on a line without any numbers. 
+
+    If elements (a set of element IDs) is given, only the lines of those 
+    elements are kept; other lines are skipped after reading their element 
+    ID field, so they are never decoded. 
+    """
+    blocks = find_stress_blocks(data, elements)
+    return [concatenate([zeros(0, dtype=int)] + [b[1] for b in blocks]),
+            concatenate([zeros(0, dtype=int)] + [b[2] for b in blocks])]
+
+_subcase_label = re.compile(rb'SUBCASE\s+(\d+)')
+_subcase_lookback = 8 # Lines above a stress header searched for its page's SUBCASE label.
+
+def _find_all(data, word):
+    out = []
+    p = data.find(word)
+    while p >= 0:
+        out.append(p)
+        p = data.find(word, p + 1)
+    return array(out, dtype=int)
+
+def _ranges(first, counts, step):
+    """
+    Concatenation of the ranges first[i], first[i] + step, ... of counts[i] values each. 
+    """
+    offsets = cumsum(counts) - counts
+    return repeat(first - step * offsets, counts) + step * arange(counts.sum())
+
+def _has_e(data, starts, lens):
+    """
+    True for each line that holds an 'E', as every line of numbers in a stress table does. 
+    """
+    out = zeros(len(starts), dtype=bool)
+    wide = lens >= _stress_width
+    if wide.any():
+        window = sliding_window_view(frombuffer(data, dtype=uint8), _stress_width)
+        out[wide] = (window[starts[wide]] == ord('E')).any(1)
+    for i in flatnonzero(~out):
+        out[i] = b'E' in data[starts[i]:starts[i] + lens[i]]
+    return out
+
+def find_stress_blocks(data, elements = None):
+    """
+    find_stress_blocks(data, elements): The lines of each CQUAD4 stress block in the text 
+    of an F06 (bytes), as a list of [subcase, starts, lens] (see line_offsets). The subcase 
+    is read from the SUBCASE label of the block's page heading; a block without one 
+    belongs to the subcase of the block before it, or to subcase 1. See find_stress_rows 
+    for elements. 
+    """
+    starts, lens = line_offsets(data)
+    n = len(starts)
+    found = _find_all(data, _stress_header.encode())
+    lines = searchsorted(starts, found, 'right') - 1
+    heads = lines[found - starts[lines] == 18]
+    subcases = []
+    subcase = 1
+    for h in heads:
+        labels = _subcase_label.findall(data, starts[max(h - _subcase_lookback, 0)], starts[h])
+        if labels:
+            subcase = int(labels[-1])
+        subcases.append(subcase)
+    # Only the lines that start a pair can end a block: the first PAGE line in 
+    # step with the block's first line, or an earlier one without numbers. 
+    first = heads + 5
+    stop = full(len(first), n)
+    pages = searchsorted(starts, _find_all(data, b'PAGE'), 'right') - 1
+    for parity in (0, 1):
+        p = pages[pages % 2 == parity]
+        sel = first % 2 == parity
+        if len(p) > 0:
+            k = searchsorted(p, first[sel])
+            stop[sel] = where(k < len(p), p[minimum(k, len(p) - 1)], n)
+    counts = maximum((stop - first + 1) // 2, 0)
+    pairs = _ranges(first, counts, 2)
+    blank = flatnonzero(~_has_e(data, starts[pairs], lens[pairs]))
+    owners, i = unique(repeat(arange(len(first)), counts)[blank], return_index = True)
+    stop[owners] = pairs[blank[i]]
+    counts = maximum(minimum(stop, n) - first, 0)
+    rows = _ranges(first, counts, 1)
+    if elements is not None:
+        eid_field = line_field(data, starts[rows], lens[rows], 1, 9)
+        named = eid_field != b'        '
+        ids = zeros(len(rows), dtype=int)
+        ids[named] = eid_field[named].astype(int)
+        # Forward fill the element ID within each block; leading unnamed lines get 0. 
+        mark = named.copy()
+        mark[(cumsum(counts) - counts)[counts > 0]] = True
+        owner = maximum.accumulate(where(mark, arange(len(rows)), 0)) if len(rows) else rows
+        keep = isin(ids[owner], array(sorted(elements), dtype=int))
+        kept = [int(x.sum()) for x in split(keep, cumsum(counts)[:-1])] if len(counts) else []
+        rows = rows[keep]
+        counts = array(kept, dtype=int)
+    return [[sc, starts[r], lens[r]] for sc, r in
+            zip(subcases, split(rows, cumsum(counts)[:-1]) if len(counts) else [])]
+
+def subcase_lines(lines, loads):
+    """
+    subcase_lines(lines, loads): Rewrite the case control of a deck to run one 
+    SUBCASE per load set. loads is a list of [subcase, load set ID] pairs. 
+    Top level LOAD requests are removed and the subcases are added right 
+    before BEGIN BULK; every other request still applies to all subcases. 
+    """
+    out = []
+    case_control = False
+    for line in lines:
+        word = line.strip().upper()
+        if word.startswith('CEND'):
+            case_control = True
+        elif case_control and word.startswith('BEGIN'):
+            for subcase, sid in loads:
+                out.append("SUBCASE {}\n".format(subcase))
+                out.append("  LOAD = {}\n".format(sid))
+            case_control = False
+        elif case_control and word.startswith('LOAD') and word[4:].lstrip().startswith('='):
+            continue
+        out.append(line)
+    return out
+
+def read_stress_table(f06_fname):
+    """
+    read_stress_table(f06_fname): Parse all CQUAD4 stress tables in an F06 file. 
+    Returns None if the file is not readable. 
+    """
+    for i in range(5):
+        try:
+            with open(f06_fname, 'rb') as f:
+                data = f.read()
+            return stress_table.from_lines(data, *find_stress_rows(data))
+        except Exception as e:
+            print("ERROR: {}".format(e))
+    return None
+
+def von_mises_array(s1, s2):
+    """
+    Array version of to_von_mises. 
+    """
+    return (((s1 - s2)**2 + s1**2 + s2**2)/2)**0.5
+
 def max_cquad_stress(f06_fname):
-    def get_max_stress(l, loc, last_val):
-        max_stress = last_val
-        max_stress = max(to_von_mises(l[87:100],l[103:116]),max_stress)
-        return max_stress
-    return act_on_stress_lines(f06_fname, get_max_stress)
+    table = read_stress_table(f06_fname)
+    if table is None:
+        return 1.0*10**10 # Return an absurdly high stress is the file isn't found or has failed.
+    if len(table) == 0:
+        return 0
+    return max(0, float(table.von_mises.max()))
 
 def max_cquad_stress_loc(f06_fname):
-    def get_max_stress(l, loc, last_val):
-        try:
-            old_stress = last_val[0]
-        except TypeError as e:
-            old_stress = 0
-        new_stress = max(to_von_mises(l[87:100],l[103:116]),old_stress)
-        if old_stress != new_stress:
-            return [new_stress, loc]
-        else:
-            return last_val
-    return act_on_stress_lines(f06_fname, get_max_stress)
+    table = read_stress_table(f06_fname)
+    if table is None:
+        return 1.0*10**10
+    if len(table) == 0:
+        return 0
+    i = int(argmax(table.von_mises))
+    return [float(table.von_mises[i]), table.loc[i].decode()]
 
 def stress_at_point(f06_fname, point):
-    def get_point_stress(l, loc, last_val):
-        if (l[1:9] != '        ' and int(l[1:9]) == point):
-            return [l[30:43],l[45:58],l[60:73]]
-        else:
-            return last_val
-    return act_on_stress_lines(f06_fname, get_point_stress)
+    table = read_stress_table(f06_fname)
+    if table is None:
+        return 1.0*10**10
+    rows = where(table.center & (table.eid == point))[0]
+    if len(rows) == 0:
+        return 0
+    i = rows[-1]
+    return [table.sx[i], table.sy[i], table.txy[i]]
 
 def stress_all_point(f06_fname):
-    def get_point_stress(l, loc, last_val):
-        try:
-            dummy = last_val[0]
-        except:
-            last_val = []
-        a = last_val + [[l[30:43],l[45:58],l[60:73]]]
-        if (l[1:9] != '        '):
-            return a
-        else:
-            return last_val
-    return act_on_stress_lines(f06_fname, get_point_stress)
+    table = read_stress_table(f06_fname)
+    if table is None:
+        return 1.0*10**10
+    return table.center_stresses
 
 
 def mass(f06_name):
@@ -0,0 +1,180 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Metrics
+  Purpose: Wall and CPU time of each phase of the optimization loop, per
+           generation and per system, with solver slot utilization, and
+           export of the records to JSON or CSV.
+"""
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from time import time, thread_time
+import json
+import csv
+
+# Phases in the order they appear in records and reports.
+_phases = ['deck', 'solver', 'parse', 'fitness', 'surrogate', 'selection', 'pareto',
+        'checkpoint', 'plot']
+
+def timed(metrics, name):
+    """
+    timed(metrics, name): Context manager timing phase name into metrics, or
+                          doing nothing if metrics is None.
+    """
+    return nullcontext() if metrics is None else metrics.phase(name)
+
+def slot_utilization(rec):
+    """
+    slot_utilization(rec): Fraction of the solver slots kept busy while the
+                           solver phase of a record ran. None if no job ran.
+    """
+    if rec['solver_capacity'] <= 0:
+        return None
+    return rec['solver_busy'] / rec['solver_capacity']
+
+class run_metrics(object):
+    """
+    Class 'run_metrics'
+
+    Phase timings of an optimization run. optimize_system opens a record
+    with begin() for every generation (0 being the initial population,
+    i + 1 trial generation i) and a last one, with generation None, for the
+    plotting done once the system finishes. Phases timed while a record is
+    open are added to it; phases timed outside of one are not recorded.
+
+    Wall time is measured around each phase. CPU time is that of the thread
+    running the phase, so the solver phase shows the time the Python side
+    spends waiting on solver processes, and parsing and fitness evaluation,
+    which run on a helper thread while the solver jobs are still going,
+    are reported on their own even though their wall time overlaps the
+    solver phase.
+
+    Properties:
+    records: List of dictionaries, one per system and generation, with keys
+             system, generation, wall (of the whole generation),
+             <phase>_wall and <phase>_cpu for each phase, solver_jobs
+             (solver processes run), solver_busy (their summed run time)
+             and solver_capacity (slots times solver phase wall time).
+    """
+    def __init__(self):
+        self.records = []
+        self._current = None
+        self._start = None
+        self._lock = Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def begin(self, system, generation):
+        """
+        begin(system, generation): Close the open record, if any, and open a new one.
+        """
+        self.end()
+        rec = {'system': system, 'generation': generation, 'wall': 0.,
+                'solver_jobs': 0, 'solver_busy': 0., 'solver_capacity': 0.}
+        for p in _phases:
+            rec[p + '_wall'] = 0.
+            rec[p + '_cpu'] = 0.
+        self._current = rec
+        self._start = time()
+
+    def end(self):
+        """
+        end(): Close the open record.
+        """
+        if self._current is not None:
+            self._current['wall'] = time() - self._start
+            self.records.append(self._current)
+            self._current = None
+
+    def add(self, name, wall, cpu):
+        """
+        add(name, wall, cpu): Add time to phase name of the open record.
+        """
+        with self._lock:
+            if self._current is not None:
+                self._current[name + '_wall'] += wall
+                self._current[name + '_cpu'] += cpu
+
+    @contextmanager
+    def phase(self, name):
+        """
+        phase(name): Context manager timing the enclosed code as phase name.
+        """
+        wall, cpu = time(), thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time() - wall, thread_time() - cpu)
+
+    def add_jobs(self, jobs, n_slots, wall):
+        """
+        add_jobs(jobs, n_slots, wall): Count the job_result objects of one batch of
+        solver jobs, run on n_slots slots in wall seconds.
+        """
+        with self._lock:
+            if self._current is not None:
+                self._current['solver_jobs'] += len(jobs)
+                self._current['solver_busy'] += sum(j.elapsed for j in jobs)
+                self._current['solver_capacity'] += n_slots * wall
+
+    def systems(self):
+        """
+        systems(): Records summed over the generations of each system, with the
+        number of generations in place of generation.
+        """
+        out = {}
+        for rec in self.records:
+            s = out.get(rec['system'])
+            if s is None:
+                s = out[rec['system']] = dict(rec, generation = 0)
+                for k in s:
+                    if k not in ('system', 'generation'):
+                        s[k] = 0
+            if rec['generation'] is not None:
+                s['generation'] += 1
+            for k in s:
+                if k not in ('system', 'generation'):
+                    s[k] += rec[k]
+        return [out[k] for k in sorted(out)]
+
+    def report(self, system):
+        """
+        report(system): One line summary of the phase wall times of a system.
+        """
+        for s in self.systems():
+            if s['system'] == system:
+                parts = ["{} {:.3f}s".format(p, s[p + '_wall']) for p in _phases
+                        if s[p + '_wall'] > 0]
+                u = slot_utilization(s)
+                if u is not None:
+                    parts.append("slot utilization {:.0%}".format(u))
+                return "Phase times of system {}: {}".format(system, ", ".join(parts))
+        return "Phase times of system {}: none recorded".format(system)
+
+    def write(self, fname):
+        """
+        write(fname): Write the records to fname, as CSV if it ends in .csv and as
+        JSON otherwise. The JSON file also holds the per-system totals.
+        """
+        def with_util(recs):
+            return [dict(r, slot_utilization = slot_utilization(r)) for r in recs]
+        if fname.endswith('.csv'):
+            fields = (['system', 'generation', 'wall'] +
+                    [p + s for p in _phases for s in ('_wall', '_cpu')] +
+                    ['solver_jobs', 'solver_busy', 'solver_capacity', 'slot_utilization'])
+            with open(fname, 'w', newline = '') as f:
+                w = csv.DictWriter(f, fieldnames = fields)
+                w.writeheader()
+                w.writerows(with_util(self.records))
+        else:
+            with open(fname, 'w') as f:
+                json.dump({'phases': _phases, 'generations': with_util(self.records),
+                    'systems': with_util(self.systems())}, f, indent = 1)
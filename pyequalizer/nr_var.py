@@ -1,4 +1,14 @@
-from copy import deepcopy
+from numpy import ndarray
+
+def _read_only(val):
+    """
+    Arrays are handed out as read-only views, scalars as they are.
+    """
+    if isinstance(val, ndarray):
+        val = val.view()
+        val.flags.writeable = False
+    return val
+
 class nr_var(object):
     def __init__(self, mu, sigma):
         """
@@ -12,10 +22,10 @@ class nr_var(object):
     
     @property
     def sigma(self):
-        return deepcopy(self._sigma)
+        return _read_only(self._sigma)
     @property
     def mu(self):
-        return deepcopy(self._mu)
+        return _read_only(self._mu)
     @property
     def list(self):
         return [self.mu, self.sigma]
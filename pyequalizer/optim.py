@@ -8,46 +8,28 @@
   Date:   2018-07-12
 """
 from pyequalizer.fileops import *
+from pyequalizer.results import *
+from pyequalizer.fileops import _valid_entries
+from pyequalizer.bulk import bulk_deck, card
+from pyequalizer.cache import run_cache
+from pyequalizer.scratch import scratch_space
+from pyequalizer.population import *
+from pyequalizer.evolve import *
+from pyequalizer.pareto import *
+from pyequalizer.stochastic import *
+from pyequalizer.stress_tensor import plane_tensors, voigt_tensors
+from pyequalizer.surrogate import gp_surrogate
+from pyequalizer.metrics import timed
 from pyequalizer.nr_var import *
 from pyequalizer.math_utils import *
-from copy import deepcopy
-from numpy import array,trace
-from multiprocessing.pool import Pool
+from numpy import array,trace,where,argmin,stack,zeros
+from numpy.random import default_rng
+from time import time
 import random
 import math
+import os
 import msslhs
 
-class Ind(object):
-    def __init__(self, props, sys_num):
-        self.props = props
-        self.sys_num = sys_num
-        self._fitness = -1000
-
-    def to_array(self):
-        return [self.props, self.fitness]
-
-    @classmethod
-    def from_array(cls, array, sys_num):
-        obj = cls(array[0], sys_num)
-        obj._fitness = array[1]
-        obj.fitness_unconst = array[2]
-        return obj
-    @property
-    def fitness(self):
-        return self._fitness
-
-    def __str__(self):
-        out = "***SYSTEM DEFINITION***"
-        out = out + "\nProperties:\n{}".format(self.props)
-        out = out + "\nSystem Number:\n{}".format(self.sys_num)
-        out += "Cost:\n{}".format(self.fitness)
-        out = out + "\n\n"
-        return str(out)
-    def __eq__(self, other):
-        return [self.props[x][3] == other.props[x][3] for x in range(len(self.props))]
-    def __hash__(self):
-        return hash(tuple(self.props[x][3] for x in range(len(self.props))))
-
 def make_linear_map(low_limit, high_limit):
     """
     Build a function to convert a (0,1) range into an arbitrary space
@@ -84,12 +66,19 @@ def isolate_front(vec_ind, dom_func):
     """
     isolate_front(vec): Isolate and return a domination front from a 
                          given vector of organisms. truth controls which front you get. 
+    dominates and antidominates are resolved on the fitness array by
+    pyequalizer.pareto; any other dom_func is checked pair by pair.
     """
+    if len(vec_ind) == 0:
+        return []
+    if dom_func is dominates or dom_func is antidominates:
+        F = fitness_matrix(vec_ind)
+        mask = pareto_mask(F if dom_func is dominates else -F)
+        return [vec_ind[x] for x in where(mask)[0]]
     vec = [a.to_array() for a in vec_ind]
     def dominates_all(index):
-        ind = deepcopy(vec)
-        target = ind.pop(index)
-        compval = any(map(lambda h: dom_func(target,h), ind))
+        target = vec[index]
+        compval = any(dom_func(target, vec[h]) for h in range(len(vec)) if h != index)
         return not compval
     front = [vec_ind[x] for x in range(len(vec)) if dominates_all(x)]
     return front
@@ -104,6 +93,31 @@ def isolate_pareto(vec):
 def isolate_antipareto(vec):
     return isolate_front(vec, antidominates)
 
+def pareto_ranks(vec):
+    """
+    pareto_ranks(vec): Non-dominated sorting rank of every organism, 0 being the pareto front.
+    """
+    return non_dominated_sort(fitness_matrix(vec))
+
+# Positions, in element ID order, of the CQUAD4 elements whose stochastic
+# stress drives a system_unit. 
+_target_elements = [100,106,219,220,221,222,277,301,575,711,712,713,744,745,824]
+
+def _frozen_voigt(voigt):
+    """
+    An (n_elem, 3) float array of stresses that cannot be written to.
+    """
+    v = array(voigt, dtype=float).reshape(-1, 3)
+    v.flags.writeable = False
+    return v
+
+def freeze_cards(cards):
+    """
+    freeze_cards(cards): A list of cards as a tuple of field tuples, so it can
+                         be handed out without copying.
+    """
+    return tuple(tuple(card) for card in cards)
+
 def fold_in_force(props, force):
     """
     fold_in_force(props, vec): Fold the force set for a system into the properties for a generation. 
@@ -113,7 +127,8 @@ def fold_in_force(props, force):
            In effect, an array of arrays of property cards. 
     force: A set of FORCE card entries. 
     """
-    return [x + force for x in props]
+    force = list(force)
+    return [list(x) + force for x in props]
 
 
 class system (object):
@@ -124,15 +139,26 @@ class system (object):
     Includes the base file, as well as information on the current generation being processed. 
 
     Properties:
-    base_lines: The base input deck coded as an array of individual lines. 
-    base_props: Array of information used to construct baseline property cards. 
+    base_lines: The base input deck coded as a tuple of individual lines. 
+    template: deck_template of base_lines, used to write each individual's deck. 
+    deck: bulk_deck indexing every card of the base file. 
+    base_props: Tuple of field tuples used to construct baseline property cards. 
+    base_force: Tuple of field tuples of the system's FORCE cards. 
+    The base_* accessors hand out these shared, immutable values rather than copies; 
+    base_props_list() gives a copy that can be edited. 
     n_gen: Maximum number of generations to optimize for. 
     n_org: The number of organisms per generations. 
-    fitness_funcs: a list of fitness functions that take a list of output file names as 
+    fitness_funcs: a list of fitness functions that take a list of f06_result objects as 
                    input and returns a list of fitness values. See examples in
                    __main__
     prefix: The file name prefix to use for making the input and output decks. 
     binary: The binary for "nastran" or your favorite compatible solver.
+    cache: Optional run_cache used to skip solver runs for decks already solved.
+    executor: solver_executor used to launch solver jobs.
+    scratch: scratch_space giving every individual of every generation its own directory.
+    rng: numpy.random.Generator driving mutation and crossover. 
+    generation: Number of generations run so far. 
+    surrogate: Optional gp_surrogate screening trial vectors before they are solved. 
     """
 
     F = 0.1
@@ -140,7 +166,8 @@ class system (object):
 
     def __init__(self, sys_num, fname, n_gen, n_org, 
             fitness_funcs, const_funcs, prefix = "/tmp/nastran/optim", 
-            binary = "/usr/bin/nastran", force = []):
+            binary = "/usr/bin/nastran", force = [], cache = None, executor = None, 
+            scratch = None, seed = None, surrogate = None):
         """ 
         Initialize the system class.
         
@@ -150,67 +177,103 @@ class system (object):
         base_props: Array of information used to construct baseline property cards. 
         n_gen: Maximum number of generations to optimize for. 
         n_org: The number of organisms per generations. 
-        fitness_funcs: a list of fitness functions that take a list of output file names as 
+        fitness_funcs: a list of fitness functions that take a list of f06_result objects as 
                        input and returns a list of fitness values. See examples in
                        __main__
         prefix: The file name prefix to use for making the input and output decks. 
+                The directory part is the scratch root when no scratch is given, 
+                the rest names the decks. 
         binary: The binary for "nastran" or your favorite compatible solver.
+        cache: Optional run_cache used to skip solver runs for decks already solved.
+        executor: solver_executor used to launch solver jobs. Defaults to one
+                  job per CPU, with no timeout or retries. 
+        scratch: scratch_space to write decks into. Systems that run side by side
+                 may share one. 
+        seed: Seed for the random generator used by the evolution operators. 
+        surrogate: Optional gp_surrogate used to skip solving trial vectors that 
+                   are unlikely to win selection. 
         """
         self.sys_num = sys_num
         self.__lines = load_from_file(fname)
-        self.__base_lines = strip_force(strip_props(self.__lines))
-        self.__base_props = read_properties(self.__lines)
+        self.__deck = bulk_deck(self.__lines)
+        self.__base_lines = tuple(self.__deck.lines_without(_valid_entries + ["FORCE"]))
+        self.__template = deck_template(self.__base_lines)
+        self.__base_props = freeze_cards(self.__deck.fields(_valid_entries))
         self.n_gen = n_gen
         self.__n_org = n_org
         self.__prefix = prefix
         self.__binary = binary
         self.fitness_funcs = fitness_funcs
         self.const_funcs = const_funcs
-
-        if force == []:
-            self.__base_force = read_force(self.__lines)
+        self.cache = cache
+        self.executor = executor if executor is not None else solver_executor()
+        if scratch is None:
+            scratch = scratch_space(os.path.dirname(prefix) or ".")
+        self.scratch = scratch
+        self.generation = 0
+        self.rng = default_rng(seed)
+        self.surrogate = surrogate
+        self.metrics = None # run_metrics the phases of each generation are timed into.
+
+        if len(force) == 0:
+            self.__base_force = freeze_cards(self.__deck.fields(["FORCE"]))
         else:
-            self.__base_force = force
+            self.__base_force = freeze_cards(force)
         
 
     @property
     def n_org(self):
-        return deepcopy(self.__n_org)
+        return self.__n_org
     @n_org.setter
     def n_org(self,val):
         pass
     
     @property
     def base_props(self):
-        return deepcopy(self.__base_props)
+        return self.__base_props
     @base_props.setter
     def base_props(self,val):
         pass
 
+    def base_props_list(self):
+        """
+        base_props_list(): A copy of base_props as a list of field lists, for callers
+                           that fill in fields themselves. 
+        """
+        return [list(card) for card in self.__base_props]
+
     @property
     def base_lines(self):
-        return deepcopy(self.__base_lines)
+        return self.__base_lines
     @base_lines.setter
     def base_lines(self,val):
         pass
 
+    @property
+    def template(self):
+        return self.__template
+
+    @property
+    def deck(self):
+        return self.__deck
+
     @property
     def prefix(self):
-        return deepcopy(self.__prefix)
+        return self.__prefix
     @prefix.setter
     def prefix(self,val):
         pass
     
     @property
     def binary(self):
-        return deepcopy(self.__binary)
+        return self.__binary
     @binary.setter
     def binary(self,val):
         pass
 
     @property
     def base_force(self):
-        return deepcopy(self.__base_force)
+        return self.__base_force
     @base_force.setter
     def base_force(self, val):
         pass
@@ -221,115 +284,169 @@ class system (object):
                           represent a generation of the current system. 
 
         """
-        props = []
         lhs_exp = make_linear_map(0,250)
-        lhs_vals = msslhs.sample(len(self.base_props),self.n_org,1)[0].transpose().tolist()
-        for x in range(self.n_org):
-            org = self.base_props
-            for i in range(len(org)):
-                org[i][3] = "{:.3f}".format(lhs_exp(lhs_vals[i][x]))
-            props.append(org)
-        return props
+        lhs_vals = msslhs.sample(len(self.base_props),self.n_org,1,self.rng)[0]
+        return Population(lhs_exp(lhs_vals).reshape(self.n_org, -1), self.base_props, self.sys_num)
 
-    def crossover(self, props):
+    def crossover(self, pop):
         """
-        crossover(props):   Cross over a series of cquad propery handles as a
-                          part of differential evolution. 
+        crossover(pop):   Cross over a population as a part of differential evolution. 
 
         Arguments: 
-        props: list of property arrays describing a series of 
-               individual organisms. 
+        pop: Population describing a series of individual organisms. 
 
         Returns: 
-        A list of properties that have been mutated and crossed over. 
-        """
-        props_out = []
-        def pull_thicknesses(prop):
-            #print(prop)
-            return [float(n[3]) for n in prop]
-        def push_thicknesses(prop,thk):
-            p = deepcopy(prop)
-            out = []
-            for n in range(len(prop)):
-                p[n][3] = "{:.3f}".format(thk[n])
-            return p
-
-        for i in range(len(props)): 
-            #Select random indices to use in mutation
-            indices = list(range(len(props)))
-            _ = indices.pop(i)
-            j = indices.pop(random.randrange(len(indices)))
-            k = indices.pop(random.randrange(len(indices)))
-
-            t_i  = pull_thicknesses(props[i])
-            r1_i = pull_thicknesses(props[j])
-            r2_i = pull_thicknesses(props[k])
-            x_i = t_i
-            vi_rhs = [self.F * (r1_i[n] - r2_i[n]) for n in range(len(x_i))]
-            
-            #create mutated vector -- abs taken because thickness cannot be negative in nastran. 
-            v_i = [abs(y + z) for y, z in zip(x_i, vi_rhs)]
-            
-            u_i = [ x_i[n] if random.random() > self.CR else v_i[n] for n in range(len(x_i))]
-            props_out.append(push_thicknesses(props[i],u_i))
-        return props_out
+        A Population that has been mutated and crossed over. 
+        """
+        j, k = de_indices(pop.n_ind, self.rng)
+        v = de_mutate(pop.x, j, k, self.F)
+        out = de_crossover(pop.x, v, self.CR, self.rng)
+        return Population(out, pop.base_props, pop.sys_num)
 
     def selection(self, left, right):
         """
-        selection(left,right): Given 2 property vectors, provide DE-style selection.
+        selection(left,right): Given 2 evaluated populations, provide DE-style selection.
+        Each individual of right replaces its counterpart in left when no fitness 
+        value of left's individual is better (lower). 
 
         Parameters: 
-        left: Vector of properties and fitnesses. 
+        left: Population with fitnesses. 
         right: ditto. 
         """
-        outvec = []
-        for l_i,r_i in zip(left,right):
-            # test the fitness values (located at array index 1)
-            # against one another to determine best choice for next
-            # Generation
-            l = l_i.to_array()
-            r = r_i.to_array()
-            if dominates(l,r):
-                outvec.append(deepcopy(r_i))
+        return left.merge(right, de_select(left.fitness, right.fitness))
+
+    def deck_names(self, n, tag = ""):
+        """
+        deck_names(n, tag): Input deck names for n individuals of the current generation. 
+        """
+        name = os.path.basename(self.prefix) + tag
+        return self.scratch.deck_names(self.sys_num, self.generation, n, name)
+
+    def end_generation(self):
+        """
+        end_generation(): Release the current generation's scratch space and move on. 
+        """
+        self.scratch.release(self.sys_num, self.generation)
+        self.generation += 1
+
+    def solve(self, files, on_result = None, elements = None):
+        """
+        solve(files, on_result, elements): Run the solver on a list of input decks and return an 
+                                 f06_result for each. Decks found in the cache are not run,
+                                 and identical decks within the list are only run once. 
+                                 Raises SolverError if any solver job fails, 
+                                 including jobs whose output is missing or fatal. 
+
+        on_result(i, result) is called for each deck as soon as its result is 
+        available, so that post-processing overlaps with solver jobs still running. 
+        If elements (a set of element IDs) is given, only their stresses are read. 
+        """
+        results = [None for f in files]
+        def read(fname):
+            with timed(self.metrics, 'parse'):
+                return read_f06(fname, elements)
+        def run(files, on_complete):
+            start = time()
+            with timed(self.metrics, 'solver'):
+                jobs = run_nastran(self.binary, files, self.executor, on_complete)
+            if self.metrics is not None:
+                self.metrics.add_jobs(jobs, self.executor.n_workers, time() - start)
+        def check(job, result):
+            # run_nastran retries jobs whose output is missing or fatal; output that 
+            # still could not be read fails the job. 
+            if not result.found:
+                job.error = "no output file"
+            elif result.fatal:
+                job.error = "fatal message in output"
+        def done(indices, result):
+            for i in indices:
+                results[i] = result
+                if on_result is not None:
+                    on_result(i, result)
+        if self.cache is None:
+            def parse(i, job):
+                res = read(job.fname + ".out")
+                check(job, res)
+                done([i], res)
+            run(files, parse)
+            return results
+        # Results read with an element filter are cached apart from full results. 
+        tag = self.binary
+        if elements is not None:
+            tag += "|elements:" + ",".join(str(e) for e in sorted(elements))
+        keys = [self.cache.key(f, tag) for f in files]
+        to_run = {}
+        for i in range(len(files)):
+            hit = self.cache.get(keys[i]) if keys[i] not in to_run else None
+            if hit is not None:
+                done([i], hit)
             else:
-                outvec.append(deepcopy(l_i))
-        return outvec
+                to_run.setdefault(keys[i], []).append(i)
+        run_keys = list(to_run.keys())
+        def parse_and_store(j, job):
+            res = read(job.fname + ".out")
+            check(job, res)
+            if res.ok:
+                self.cache.put(run_keys[j], res)
+            done(to_run[run_keys[j]], res)
+        run([files[to_run[k][0]] for k in run_keys], parse_and_store)
+        return results
+
+    def evaluate(self, result):
+        """
+        evaluate(result): Fitness and unconstrained fitness of a single individual
+                          from its f06_result. 
+        """
+        fitness_unconst = [fn([result])[0] for fn in self.fitness_funcs]
+        mult = 1 + sum([fn([result])[0] for fn in self.const_funcs])
+        return [[a * mult for a in fitness_unconst], fitness_unconst]
 
-    def get_fitness_vector(self, props, files):
+    def get_fitness_vector(self, props, results):
         """
         Generate the standard fitness vector from a series of properties.
+        Each output file is parsed once and the resulting f06_result objects
+        are shared by every fitness and constraint function.
         """
-        fitness_unconst = [[] for a in props]
-        fitness = deepcopy(fitness_unconst)
-        fitness_mults = [1 for a in props]
-        for fn in self.fitness_funcs:
-            res = fn(files)
-            for x in range(len(files)):
-                fitness_unconst[x].append(res[x])
-        for fn in self.const_funcs:
-            res = fn(files)
-            for x in range(len(fitness)):
-                fitness_mults[x] += res[x]
-        for x in range(len(fitness)):
-            fitness[x] = [ a * fitness_mults[x] for a in fitness_unconst[x] ]
-        return [fitness, fitness_unconst]
+        evals = [self.evaluate(r) for r in results]
+        return [[a[0] for a in evals], [a[1] for a in evals]]
 
 
+    def make_population(self, vec):
+        """
+        make_population(vec): Unevaluated Population of this system from a Population, 
+                              a list of Ind or a list of property card lists. 
+        """
+        if isinstance(vec, Population) or all(isinstance(a, Ind) for a in vec):
+            return Population.from_inds(vec, self.base_props, self.sys_num)
+        return Population.from_props(vec, self.base_props, self.sys_num)
+
     def run_generation(self, prop_func, last_props):
         """
-        first_generation(): Run a single generation of the optimiser, 
-                            stopping at the fitness function generation. 
+        run_generation(): Run a single generation of the optimiser, 
+                          stopping at the fitness function generation. 
 
         Arguments: 
         prop_func: Function that determines the population of the current generation. 
-        last_props: props from the last generation. 
+                   It may return a Population or a list of property card lists. 
+        last_props: Population (or props) from the last generation. 
+
+        Returns the evaluated Population. 
         """
-        props = prop_func(last_props)
-        files = multi_file_out(fold_in_force(props, self.__base_force), self.base_lines, self.prefix)
-        run_nastran(self.binary, files)
-        fitness, fitness_unconst = self.get_fitness_vector(props, files)
-        out = [Ind.from_array(a, self.sys_num) for a in list(zip(props, fitness, fitness_unconst))]
-        return out
+        pop = prop_func(last_props)
+        if not isinstance(pop, Population):
+            pop = self.make_population(pop)
+        props = pop.all_props()
+        with timed(self.metrics, 'deck'):
+            files = multi_file_out(fold_in_force(props, self.__base_force), self.template, 
+                    self.prefix, self.deck_names(len(props)))
+        evals = [None for p in props]
+        def on_result(i, result):
+            with timed(self.metrics, 'fitness'):
+                evals[i] = self.evaluate(result)
+        self.solve(files, on_result)
+        self.end_generation()
+        pop.set_fitness([a[0] for a in evals], [a[1] for a in evals])
+        return pop
 
     def dummy_generation(self, last_vec, ind_cls = Ind):
         """
@@ -337,33 +454,92 @@ class system (object):
 
         Commonly used when validating an individual against another load case.
         """
-        last_props = [deepcopy(a.props) for a in last_vec]
-        out = self.run_generation(deepcopy,last_props)
-        return out
+        return self.run_generation(self.make_population, last_vec)
 
     def trial_generation(self, last_vec):
-        #isolate the property vector from last generation
-        last_props = [deepcopy(a.props) for a in last_vec]
+        #isolate the design variables from last generation
+        last_pop = last_vec if isinstance(last_vec, Population) else self.make_population(last_vec)
+        if self.surrogate is not None:
+            return self.screened_trial_generation(last_pop)
         #run the crossover function to obtain trial vector with fitnesses. 
-        trial_vec = self.run_generation(self.crossover, last_props)
-        return self.selection(last_vec, trial_vec)
+        trial_vec = self.run_generation(self.crossover, last_pop)
+        with timed(self.metrics, 'selection'):
+            return self.selection(last_pop, trial_vec)
+
+    def screened_trial_generation(self, last_pop):
+        """
+        screened_trial_generation(last_pop): trial_generation with the surrogate 
+        deciding which trial vectors are solved. Parents of trials that are not 
+        solved are kept as they are. 
+        """
+        trial = self.crossover(last_pop)
+        with timed(self.metrics, 'surrogate'):
+            idx = where(self.surrogate.screen(trial.x, last_pop.fitness, self.rng))[0]
+        take = zeros(last_pop.n_ind, dtype=bool)
+        if len(idx) == 0:
+            self.end_generation()
+            self.surrogate.record(zeros((0, last_pop.fitness.shape[1])), take[idx])
+            return last_pop.merge(last_pop, take)
+        solved = self.run_generation(lambda _: Population(trial.x[idx], trial.base_props, 
+            trial.sys_num), last_pop)
+        with timed(self.metrics, 'surrogate'):
+            won = de_select(last_pop.fitness[idx], solved.fitness)
+            take[idx] = won
+            self.surrogate.record(solved.fitness, won)
+            self.surrogate.observe(solved.x, solved.fitness)
+        # Line the solved trials up with their parents for the merge. 
+        with timed(self.metrics, 'selection'):
+            x = last_pop.x.copy()
+            fitness = last_pop.fitness.copy()
+            fitness_unconst = last_pop.fitness_unconst.copy()
+            x[idx], fitness[idx], fitness_unconst[idx] = solved.x, solved.fitness, solved.fitness_unconst
+            members = None
+            if last_pop.members is not None and solved.members is not None:
+                members = list(last_pop.members)
+                for j, i in enumerate(idx):
+                    members[i] = solved.members[j]
+            right = Population(x, last_pop.base_props, last_pop.sys_num, fitness, fitness_unconst, 
+                    members)
+            return last_pop.merge(right, take)
 
     def first_generation(self, ind_cls = Ind):
         """first_generation(): Returns result of initial generation"""
         out = self.run_generation(self.gen_generation, [])
+        if self.surrogate is not None:
+            with timed(self.metrics, 'surrogate'):
+                self.surrogate.observe(out.x, out.fitness)
         return out
 
 
 class tensor_ind(Ind):
-    def __init__(self, props, sys_num, x_force, y_force, x_tensor, y_tensor, mass):
+    """
+    Class 'tensor_ind'
+
+    An individual of a system_unit, carrying the stresses its design sees
+    under the unit x and y loads. The stresses are kept as compact (n_elem, 3)
+    read-only arrays of [sx, sy, txy]; stress_tensor objects are built only
+    when x_tensors or y_tensors are indexed.
+
+    Properties:
+    x_voigt, y_voigt: (n_elem, 3) unit load stresses, one row per CQUAD4 element.
+    element_ids: Element ID of each row, if known.
+    target_elements: Rows (not element IDs) the stochastic stress is evaluated at.
+                     Defaults to _target_elements, i.e. rows of a full-mesh table. 
+    """
+    def __init__(self, props, sys_num, x_force, y_force, x_voigt, y_voigt, mass, 
+            element_ids = None, target_elements = None):
         super().__init__(props, sys_num)
-        self._x_tensors = x_tensor
-        self._y_tensors = y_tensor
+        self._x_voigt = _frozen_voigt(x_voigt)
+        self._y_voigt = _frozen_voigt(y_voigt)
+        self.element_ids = element_ids
+        self._rows = None
         self.x_force = from_nas_real(x_force[0][5])  # Force used in making the tensors
         self.y_force = from_nas_real(y_force[0][6])  # Force used in making the tensors.
         self._mass = mass
         self.min_beta = -1
-        self.target_elements = [100,106,219,220,221,222,277,301,575,711,712,713,744,745,824]
+        if target_elements is None:
+            target_elements = _target_elements
+        self.target_elements = list(target_elements)
 
     def apply_stochastic_force(self, sto_force_x, sto_force_y):
         """
@@ -376,38 +552,26 @@ class tensor_ind(Ind):
         Outputs:
             out: State of stress at each tensor. 
         """
-        mu_x, sigma_x = sto_force_x.list
-        mu_y, sigma_y = sto_force_y.list
-        out = []
-        def get_stress_from_index(i):
-           s_x = self.x_tensors[i] * (self.x_force**-1)
-           s_y = self.y_tensors[i] * (self.y_force**-1)
-           sd_x = s_x.deviator
-           sd_y = s_y.deviator
-           alpha = ((sd_x@sd_x)*mu_x**2 + ((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_x * mu_y
-                   + (sd_y @ sd_y) * mu_y**2).trace()
-           fd_alpha_px = ((sd_x@sd_x)*2*mu_x + ((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_y).trace()
-           sd_alpha_px = ((sd_x@sd_x)*2).trace()
-           fd_alpha_py = (((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_x + (sd_y @ sd_y) * 2 * mu_y).trace()
-           sd_alpha_py = ((sd_y @ sd_y) * 2).trace()
-
-           s_vm = (3/2*alpha)**0.5
-           fd_svm_px = (3/2)**0.5 * ((1/2) * (alpha)**-0.5 * fd_alpha_px)
-           sd_svm_px = ((3/2)**0.5 * (((1/2) * sd_alpha_px * (alpha)**-0.5) + 
-               ((-1/4) * (alpha)**(-3/2) * fd_alpha_px**2)))
-           fd_svm_py = (3/2)**0.5 * ((1/2) * (alpha)**-0.5 * fd_alpha_py)
-           sd_svm_py = ((3/2)**0.5 * (((1/2) * sd_alpha_py * (alpha)**-0.5) + 
-               ((-1/4) * (alpha)**(-3/2) * fd_alpha_py**2)))
-
-           E_svm = s_vm + (1/2) * (sd_svm_px * sigma_x**2 + sd_svm_py * sigma_y**2)
-           sigma_svm = (((fd_svm_px * sigma_x)**2) + ((fd_svm_py * sigma_y)**2) + 
-                   ((1/4) * ((sd_svm_px * sigma_x**2)**2 + (sd_svm_py * sigma_y**2)**2)))**0.5
-           return nr_var(E_svm, sigma_svm)
-           
-        for i in self.target_elements:
-            out.append(get_stress_from_index(i))
-            
-        return out
+        sd_x, sd_y = self.unit_deviators()
+        E_svm, sigma_svm = stochastic_von_mises(sd_x, sd_y, *sto_force_x.list, *sto_force_y.list)
+        return [nr_var(e, s) for e, s in zip(E_svm.tolist(), sigma_svm.tolist())]
+
+    def unit_deviators(self):
+        """
+        unit_deviators(): Deviators of the target elements' stress per unit x and
+                          y force, as two (n_elem, 3, 3) arrays. 
+        """
+        x = plane_tensors(self.x_voigt[self.target_elements])
+        y = plane_tensors(self.y_voigt[self.target_elements])
+        return [deviators(x * (self.x_force**-1)), deviators(y * (self.y_force**-1))]
+
+    def element_rows(self, eids):
+        """
+        element_rows(eids): Rows of x_voigt and y_voigt holding the given element IDs. 
+        """
+        if self._rows is None:
+            self._rows = {int(e): i for i, e in enumerate(self.element_ids)}
+        return [self._rows[int(e)] for e in eids]
 
     def apply_force(self, x_appforce, y_appforce):
         """
@@ -421,17 +585,23 @@ class tensor_ind(Ind):
                     all_tensors[i][1] * (y_appforce / self.y_force))
         return out
     def strip_tensors(self):
-        self._x_tensors = "STRIPPED"
-        self._y_tensors = "STRIPPED"
+        self._x_voigt = None
+        self._y_voigt = None
+    @property
+    def x_voigt(self):
+        return self._x_voigt
+    @property
+    def y_voigt(self):
+        return self._y_voigt
     @property
     def x_tensors(self):
-        return deepcopy(self._x_tensors)
+        return None if self._x_voigt is None else voigt_tensors(self._x_voigt)
     @property
     def y_tensors(self):
-        return deepcopy(self._y_tensors)
+        return None if self._y_voigt is None else voigt_tensors(self._y_voigt)
     @property
     def mass(self):
-        return deepcopy(self._mass)
+        return self._mass
     @property
     def fitness(self):
         viol = 1 + min(1000 - self.mass, 0) * -10**4
@@ -448,7 +618,9 @@ class system_unit(system):
 
     def __init__(self, sys_num, fname, n_gen, n_org, 
               x_force, y_force, sto_force_x, sto_force_y, prefix = "/tmp/nastran/optim", 
-              binary = "/usr/bin/nastran"):
+              binary = "/usr/bin/nastran", cache = None, executor = None, scratch = None, 
+              seed = None, stress_pool = None, select_elements = True, unit_subcases = False, 
+              surrogate = None):
         """
         Initializes the class with the passed in parameters. 
         
@@ -463,14 +635,31 @@ class system_unit(system):
         sto_force_y: Stochasticaly defined y force. Provided as a nr_var object.
         prefix:  Prefix for nastran derived input decks. AKA scratch directory. 
         binary:  Location of the nastran binary
+        cache:   Optional run_cache used to skip solver runs for decks already solved. 
+        executor: solver_executor used to launch solver jobs. 
+        scratch: scratch_space to write decks into. 
+        seed:    Seed for the random generator used by the evolution operators. 
+        stress_pool: Optional stochastic_pool that evaluates large batches of 
+                 individuals in worker processes. Computed in-process if not given. 
+        select_elements: Read only the target elements' stresses from the solver 
+                 output, instead of the whole mesh. 
+        surrogate: Optional gp_surrogate, see system. 
+        unit_subcases: Solve both unit loads in one deck per individual, as SUBCASE 1 
+                 (x) and SUBCASE 2 (y), instead of one deck per load. Load cards 
+                 other than the unit FORCE cards are not applied in this mode. 
         force:   Actual applied force to the object under test. Presented as a NASTRAN input card. 
         """
         super().__init__(sys_num, fname, n_gen, n_org, 
-            [], [], prefix, binary)
+            [], [], prefix, binary, cache = cache, executor = executor, scratch = scratch, 
+            seed = seed, surrogate = surrogate)
         self._x_force = x_force
         self._y_force = y_force
         self._sto_force_x = sto_force_x
         self._sto_force_y = sto_force_y
+        self.stress_pool = stress_pool
+        self.target_ids = self.element_ids_at(_target_elements) if select_elements else None
+        self.unit_subcases = unit_subcases
+        self._subcase_deck = None
 
     @property
     def x_force(self):
@@ -494,6 +683,32 @@ class system_unit(system):
     def y_applied_force(self):
         return from_nas_real(self.base_force[0][6])
 
+    def element_ids_at(self, positions):
+        """
+        element_ids_at(positions): IDs of the CQUAD4 elements at the given positions 
+        of the stress output, which lists elements in ID order. None if the deck 
+        does not have that many CQUAD4 elements. 
+        """
+        ids = sorted(c.id for c in self.deck.by_type.get("CQUAD4", []))
+        if len(positions) == 0 or max(positions) >= len(ids):
+            return None
+        return [ids[i] for i in positions]
+
+    def subcase_deck(self):
+        """
+        subcase_deck(): [template, cards] for unit_subcases mode. template is a 
+        deck_template of the base deck running one subcase per unit load, and cards 
+        are the unit FORCE cards, moved to load set IDs unused by the deck. 
+        """
+        if self._subcase_deck is None:
+            top = max([c.id for c in self.deck.cards if c.id is not None] + [0])
+            sid_x, sid_y = top + 1, top + 2
+            lines = subcase_lines(self.base_lines, [[1, sid_x], [2, sid_y]])
+            cards = ([[c[0], str(sid_x)] + list(c[2:]) for c in self.x_force] + 
+                     [[c[0], str(sid_y)] + list(c[2:]) for c in self.y_force])
+            self._subcase_deck = [deck_template(lines), cards]
+        return self._subcase_deck
+
     #def get_fitness_vector(self, inds, files):
     #    pass
     def run_generation(self, prop_func, last_props):
@@ -503,43 +718,49 @@ class system_unit(system):
 
         Arguments: 
         prop_func: Function that determines the population of the current generation. 
-        last_props: props from the last generation. 
-        """
-        props = prop_func(last_props)
-        out = self.get_tensors_from_props(props)
-        all_str = self.apply_forces(out)
-        strength = nr_var(248.211, 248.211*0.13)
-        for x in range(len(out)):
-            out[x].min_beta = min([calc_beta(y, strength) for y in all_str[x]])
-        return out
+        last_props: Population from the last generation. 
 
-    def call_apply(self, inst, x, y):
-        """
-        Helper function to call a subordinate objects method
-        "apply_force". 
-        This is here because multiprocessing in Python is bizarre. 
-        Yes, it's a hack. sue me. 
+        Returns the evaluated Population, with the tensor_ind of each individual as members. 
         """
-        return inst.apply_stochastic_force(x,y)
+        pop = prop_func(last_props)
+        if not isinstance(pop, Population):
+            pop = self.make_population(pop)
+        out = self.get_tensors_from_props(pop.all_props())
+        with timed(self.metrics, 'fitness'):
+            all_str = self.apply_forces(out)
+            strength = nr_var(248.211, 248.211*0.13)
+            betas = calc_beta(all_str, strength)
+            worst = argmin(betas, axis=1)
+            for x in range(len(out)):
+                out[x].min_beta = float(betas[x, worst[x]])
+            pop.members = out
+            pop.set_fitness([a.fitness for a in out], [a.fitness_unconst for a in out])
+        return pop
 
     def apply_forces(self, inds):
         """
-        Uses multithreading to apply loads to the unit-stress tensors
-        in the individuals provided. 
+        Apply the stochastic loads to the unit-stress tensors of the individuals
+        provided, for every individual and target element at once. 
 
         inputs: 
         inds: tensor_ind objects representing a series of designs. 
 
         outputs: 
-        app: A nxm array of stress tensors, where n is the number of individuals in inds, 
-             and m is the number of elements that data was requested from in each individual's 
-             apply_force method. 
-        """
-        pool = Pool(8)
-        args_to_pool = [ [x, self.sto_force_x, self.sto_force_y] for x in inds]
-        app = pool.starmap(self.call_apply, args_to_pool)
-        pool.terminate()
-        return app
+        app: nr_var holding n x m arrays of the mean and standard deviation of von Mises 
+             stress, where n is the number of individuals in inds, and m is the number 
+             of target elements of each individual. 
+        """
+        if len(inds) == 0:
+            return nr_var(zeros((0, 0)), zeros((0, 0)))
+        devs = [a.unit_deviators() for a in inds]
+        sd_x = stack([d[0] for d in devs])
+        sd_y = stack([d[1] for d in devs])
+        loads = self.sto_force_x.list + self.sto_force_y.list
+        if self.stress_pool is not None:
+            E_svm, sigma_svm = self.stress_pool.run(sd_x, sd_y, *loads)
+        else:
+            E_svm, sigma_svm = stochastic_von_mises(sd_x, sd_y, *loads)
+        return nr_var(E_svm, sigma_svm)
         
 
     def get_tensors(self, inds):
@@ -551,32 +772,42 @@ class system_unit(system):
         outputs: 
             (return object): individuals with tensors stored in-class. 
         """
-        props = [deepcopy(a.props) for a in inds]
+        props = [[list(card) for card in a.props] for a in inds]
         return self.get_tensors_from_props(props)
 
     def get_tensors_from_props(self, props):
-        def run_tensor(force):
-            files = multi_file_out(fold_in_force(props, force), self.base_lines, self.prefix)
-            f06_names = [ a + ".out" for a in files ]
-            run_nastran(self.binary, files)
-        
-            tensors = []
-            for f in f06_names:
-                stresses = stress_all_point(f)
-                file_tensors = []
-                for x in stresses:
-                    file_tensors.append(stress_tensor(float(x[0]),
-                        float(x[1]), 0, float(x[2]), 0, 0))
-                tensors.append(file_tensors)
-            return [tensors, f06_names]
+        def run_tensor(force, tag):
+            with timed(self.metrics, 'deck'):
+                files = multi_file_out(fold_in_force(props, force), self.template, self.prefix, 
+                        self.deck_names(len(props), tag))
+            results = self.solve(files, elements = elements)
+            return [[r.voigt for r in results], results]
+        elements = None if self.target_ids is None else frozenset(self.target_ids)
+        if self.unit_subcases:
+            with timed(self.metrics, 'deck'):
+                template, cards = self.subcase_deck()
+                files = multi_file_out(fold_in_force(props, cards), template, self.prefix, 
+                        self.deck_names(len(props), "-xy"))
+            y_results = self.solve(files, elements = elements)
+            x_tables = [r.subcase_table(1) for r in y_results]
+            y_tables = [r.subcase_table(2) for r in y_results]
+            x_voigt = [t.center_voigt for t in x_tables]
+            y_voigt = [t.center_voigt for t in y_tables]
+            element_ids = [t.center_eids for t in y_tables]
+        else:
+            [x_voigt, _] = run_tensor(self.x_force, "-x")
+            [y_voigt, y_results] = run_tensor(self.y_force, "-y")
+            element_ids = [r.element_ids for r in y_results]
+        self.end_generation()
         # Get system mass.
-        [x_tensors, _] = run_tensor(self.x_force)
-        [y_tensors, f06_names] = run_tensor(self.y_force)
-        masses = [mass(f) for f in f06_names]
+        masses = [r.mass for r in y_results]
         inds_with_tensors = []
         for i in range(len(props)):
-            inds_with_tensors.append(tensor_ind(props[i], self.sys_num, self.x_force, self.y_force, 
-                x_tensors[i], y_tensors[i], masses[i]))
+            ind = tensor_ind(props[i], self.sys_num, self.x_force, self.y_force, 
+                x_voigt[i], y_voigt[i], masses[i], element_ids[i])
+            if elements is not None:
+                ind.target_elements = ind.element_rows(self.target_ids)
+            inds_with_tensors.append(ind)
         return inds_with_tensors  
 
     def split_force_pack(self):
@@ -0,0 +1,277 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Pareto
+  Purpose: Pareto front extraction and non-dominated sorting on fitness arrays.
+
+ All fitness values are minimized. Fronts follow the dominance rule of
+ optim.dominates: an individual is dropped if any other individual is at
+ least as good in every objective, so exact duplicates drop each other.
+"""
+from numpy import (asarray, lexsort, minimum, concatenate, zeros, empty, full,
+        inf, arange, array, argmin, argsort, delete, vstack)
+from bisect import bisect_right
+from pyequalizer.population import Population
+
+_chunk = 1024 # Rows compared at once by the k-objective path, to bound memory.
+
+def fitness_matrix(vec):
+    """
+    fitness_matrix(vec): The constrained fitness of a Population or a list of
+                         organisms as an (n_ind, n_obj) array.
+    """
+    if isinstance(vec, Population) and vec.fitness is not None:
+        return vec.fitness
+    return array([a.fitness for a in vec], dtype=float).reshape(len(vec), -1)
+
+def weakly_dominated(F):
+    """
+    weakly_dominated(F): For an (n, k) fitness array, True for each row that
+                         some other row is less than or equal to in every column.
+    """
+    F = asarray(F, dtype=float)
+    n = F.shape[0]
+    if n == 0:
+        return zeros(0, dtype=bool)
+    if F.shape[1] == 2:
+        return _weakly_dominated_2d(F)
+    out = zeros(n, dtype=bool)
+    for s in range(0, n, _chunk):
+        block = F[s:s+_chunk]
+        le = (F[None, :, :] <= block[:, None, :]).all(axis=2)
+        le[arange(len(block)), arange(s, s + len(block))] = False
+        out[s:s+_chunk] = le.any(axis=1)
+    return out
+
+def _weakly_dominated_2d(F):
+    """
+    O(n log n) sweep for two objectives. After sorting by (f0, f1), a row is
+    dominated if an earlier row has f1 no larger than its own, or if it has
+    an exact duplicate (which sorts next to it).
+    """
+    n = F.shape[0]
+    order = lexsort((F[:, 1], F[:, 0]))
+    s = F[order]
+    prev_min = concatenate([[inf], minimum.accumulate(s[:-1, 1])])
+    dom = prev_min <= s[:, 1]
+    same = (s[1:] == s[:-1]).all(axis=1)
+    dom[1:] |= same
+    dom[:-1] |= same
+    out = empty(n, dtype=bool)
+    out[order] = dom
+    return out
+
+def pareto_mask(F):
+    """
+    pareto_mask(F): True for the rows of an (n, k) fitness array on the pareto front.
+    """
+    return ~weakly_dominated(F)
+
+def non_dominated_sort(F):
+    """
+    non_dominated_sort(F): Rank every row of an (n, k) fitness array by front,
+                           0 being the pareto front. Uses strict dominance
+                           (no worse in every objective, better in at least
+                           one) so duplicates share a rank.
+    """
+    F = asarray(F, dtype=float)
+    n = F.shape[0]
+    ranks = full(n, -1)
+    if n == 0:
+        return ranks
+    if F.shape[1] == 2:
+        return _non_dominated_sort_2d(F)
+    count = _domination_counts(F, F)
+    current = count == 0
+    r = 0
+    while current.any():
+        ranks[current] = r
+        # Only rows still unranked need their counts brought down.
+        rest = ranks < 0
+        count[~rest] = -1
+        count[rest] -= _domination_counts(F[current], F[rest])
+        current = count == 0
+        r += 1
+    return ranks
+
+def _domination_counts(A, F):
+    """
+    For each row of F, the number of rows of A that strictly dominate it.
+    A is compared in blocks of _chunk rows, one objective at a time, to bound memory.
+    """
+    count = zeros(F.shape[0], dtype=int)
+    for s in range(0, A.shape[0], _chunk):
+        block = A[s:s+_chunk]
+        le = block[:, 0, None] <= F[None, :, 0]
+        lt = block[:, 0, None] < F[None, :, 0]
+        for j in range(1, F.shape[1]):
+            le &= block[:, j, None] <= F[None, :, j]
+            lt |= block[:, j, None] < F[None, :, j]
+        count += (le & lt).sum(axis=0)
+    return count
+
+def _non_dominated_sort_2d(F):
+    """
+    Two objective non-dominated sort. Rows are visited in (f0, f1) order, and
+    each front keeps the f1 of its last member; a row joins the first front
+    whose last f1 is larger than its own (or equal, for an exact duplicate).
+    The last f1 of each front increases with rank, so the search is a bisection.
+    """
+    n = F.shape[0]
+    order = lexsort((F[:, 1], F[:, 0]))
+    ranks = empty(n, dtype=int)
+    tails = [] # f1 of the last row of each front.
+    last = [] # Last row of each front.
+    for idx in order:
+        f = F[idx]
+        r = bisect_right(tails, f[1])
+        # A row equal in f1 to a front's tail is only dominated by it if f0 differs.
+        if r > 0 and tails[r-1] == f[1] and (F[last[r-1]] == f).all():
+            r -= 1
+        if r == len(tails):
+            tails.append(f[1])
+            last.append(idx)
+        else:
+            tails[r] = f[1]
+            last[r] = idx
+        ranks[idx] = r
+    return ranks
+
+def crowding_distance(F):
+    """
+    crowding_distance(F): NSGA-II crowding distance of every row of an (n, k)
+                          fitness array. Rows at either end of any objective
+                          get an infinite distance.
+    """
+    F = asarray(F, dtype=float)
+    n, k = F.shape
+    dist = zeros(n)
+    if n < 3:
+        dist[:] = inf
+        return dist
+    for j in range(k):
+        order = argsort(F[:, j], kind='stable')
+        f = F[order, j]
+        span = f[-1] - f[0]
+        dist[order[0]] = inf
+        dist[order[-1]] = inf
+        if span > 0:
+            dist[order[1:-1]] += (f[2:] - f[:-2]) / span
+    return dist
+
+class pareto_archive(object):
+    """
+    Class 'pareto_archive'
+
+    Non-dominated set kept across generations. Candidates are offered one
+    at a time: a candidate is rejected if a member is at least as good in
+    every objective (so an exact duplicate of a member is rejected), and
+    otherwise joins the archive and evicts every member it is at least as
+    good as. Each offer costs one comparison against the archive, so the
+    bookkeeping grows with the number of new evaluations rather than with
+    the square of the population size.
+
+    If capacity is set, the most crowded members are dropped until the
+    archive fits, one at a time with the crowding distance recomputed.
+
+    Properties:
+    capacity: Maximum number of members, or None for no limit.
+    members: The archived organisms.
+    fitness: (n_members, n_obj) array of their constrained fitness.
+    generation: Number of completed update() calls.
+    added: Members present after the last update that were not there before.
+    removed: Members present before the last update that were evicted or truncated.
+    kept: Members present both before and after the last update.
+    rejected: Candidates of the last update that were dominated on arrival.
+    last_size: Size of the archive before the last update.
+    """
+    def __init__(self, capacity = None):
+        self.capacity = capacity
+        self.members = []
+        self.fitness = None
+        self.generation = 0
+        self.added = 0
+        self.removed = 0
+        self.kept = 0
+        self.rejected = 0
+        self.last_size = 0
+        self._tags = [] # Serial number of each member, to tell members apart across updates.
+        self._serial = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __getitem__(self, i):
+        return self.members[i]
+
+    def front(self):
+        """
+        front(): The archived organisms as a list.
+        """
+        return list(self.members)
+
+    def _offer(self, f, make_item):
+        if self.fitness is None or len(self.members) == 0:
+            self.fitness = f[None, :].copy()
+        else:
+            if (self.fitness <= f).all(axis=1).any():
+                return False
+            keep = ~(f <= self.fitness).all(axis=1)
+            if not keep.all():
+                self.members = [m for m, k in zip(self.members, keep) if k]
+                self._tags = [t for t, k in zip(self._tags, keep) if k]
+                self.fitness = self.fitness[keep]
+            self.fitness = vstack([self.fitness, f[None, :]])
+        self.members.append(make_item())
+        self._tags.append(self._serial)
+        self._serial += 1
+        return True
+
+    def add(self, item, fitness = None):
+        """
+        add(item, fitness): Offer a single organism. fitness defaults to
+                            item.fitness. Returns True if it was archived.
+        Does not truncate or update the change counts.
+        """
+        f = asarray(item.fitness if fitness is None else fitness, dtype=float).ravel()
+        return self._offer(f, lambda: item)
+
+    def truncate(self):
+        """
+        truncate(): Drop the most crowded members until the archive fits its capacity.
+        """
+        if self.capacity is None:
+            return
+        while len(self.members) > self.capacity:
+            worst = int(argmin(crowding_distance(self.fitness)))
+            del self.members[worst]
+            del self._tags[worst]
+            self.fitness = delete(self.fitness, worst, axis=0)
+
+    def update(self, vec):
+        """
+        update(vec): Offer every organism of a Population or list, truncate,
+                     and record what changed. Organisms of a Population are
+                     only built for the candidates that are archived.
+        Returns the number of members that changed (added plus removed).
+        """
+        before = set(self._tags)
+        self.last_size = len(self.members)
+        accepted = 0
+        if len(vec) > 0:
+            F = fitness_matrix(vec)
+            for i in range(len(F)):
+                if self._offer(F[i], lambda: vec[i]):
+                    accepted += 1
+        self.truncate()
+        after = set(self._tags)
+        self.kept = len(before & after)
+        self.added = len(after - before)
+        self.removed = len(before - after)
+        self.rejected = len(vec) - accepted
+        self.generation += 1
+        return self.added + self.removed
@@ -0,0 +1,157 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Population
+  Purpose: Array-backed storage of the design variables and fitness values
+           of a generation.
+"""
+from numpy import array, asarray, where, round as np_round
+
+_design_field = 3 # Field of each property card that holds the design variable.
+
+class Ind(object):
+    def __init__(self, props, sys_num):
+        self.props = props
+        self.sys_num = sys_num
+        self._fitness = -1000
+
+    def to_array(self):
+        return [self.props, self.fitness]
+
+    @classmethod
+    def from_array(cls, array, sys_num):
+        obj = cls(array[0], sys_num)
+        obj._fitness = array[1]
+        obj.fitness_unconst = array[2]
+        return obj
+    @property
+    def fitness(self):
+        return self._fitness
+
+    def __str__(self):
+        out = "***SYSTEM DEFINITION***"
+        out = out + "\nProperties:\n{}".format(self.props)
+        out = out + "\nSystem Number:\n{}".format(self.sys_num)
+        out += "Cost:\n{}".format(self.fitness)
+        out = out + "\n\n"
+        return str(out)
+    def __eq__(self, other):
+        return [self.props[x][3] == other.props[x][3] for x in range(len(self.props))]
+    def __hash__(self):
+        return hash(tuple(self.props[x][3] for x in range(len(self.props))))
+
+class Population(object):
+    """
+    Class 'Population'
+
+    A generation of individuals stored as arrays. The design variables
+    (field 3 of each property card, e.g. PSHELL thickness) are kept as an
+    (n_ind, n_var) float64 matrix rounded to the 3 decimals written to the
+    decks. Property cards are only rendered when decks are written or an
+    individual is requested.
+
+    Sequence access (len, indexing, iteration) yields Ind objects, so code
+    written against lists of Ind keeps working.
+
+    Properties:
+    x: (n_ind, n_var) matrix of design variables.
+    base_props: Property cards the design variables are written into.
+    sys_num: System the population belongs to.
+    fitness: (n_ind, n_obj) matrix of constrained fitness values, or None
+             before the population is evaluated.
+    fitness_unconst: (n_ind, n_obj) matrix of unconstrained fitness values.
+    members: Optional list of per-individual objects (e.g. tensor_ind) that
+             carry more than the design variables and fitness.
+    """
+    def __init__(self, x, base_props, sys_num, fitness = None, fitness_unconst = None,
+            members = None):
+        self.x = np_round(asarray(x, dtype=float), 3).reshape(-1, len(base_props))
+        self.base_props = base_props
+        self.sys_num = sys_num
+        self.fitness = fitness
+        self.fitness_unconst = fitness_unconst
+        self.members = members
+
+    @classmethod
+    def from_props(cls, props, base_props, sys_num):
+        """
+        from_props(props, base_props, sys_num): Build a population from a list of property card lists.
+        """
+        x = [[float(card[_design_field]) for card in p] for p in props]
+        return cls(x, base_props, sys_num)
+
+    @classmethod
+    def from_inds(cls, inds, base_props, sys_num):
+        """
+        from_inds(inds, base_props, sys_num): Build a population from a list of Ind. 
+        Fitness values are carried over if every individual has been evaluated, 
+        and individuals of Ind subclasses are kept as members. 
+        """
+        if isinstance(inds, Population):
+            return cls(inds.x, base_props, sys_num)
+        pop = cls.from_props([a.props for a in inds], base_props, sys_num)
+        if len(inds) > 0 and all(hasattr(a, 'fitness_unconst') for a in inds):
+            pop.set_fitness([a.fitness for a in inds], [a.fitness_unconst for a in inds])
+            if any(type(a) is not Ind for a in inds):
+                pop.members = list(inds)
+        return pop
+
+    @property
+    def n_ind(self):
+        return self.x.shape[0]
+
+    @property
+    def n_var(self):
+        return self.x.shape[1]
+
+    def props(self, i):
+        """
+        props(i): Property cards of individual i.
+        """
+        out = []
+        for card, val in zip(self.base_props, self.x[i]):
+            c = list(card)
+            c[_design_field] = "{:.3f}".format(val)
+            out.append(c)
+        return out
+
+    def all_props(self):
+        """
+        all_props(): Property cards of every individual.
+        """
+        return [self.props(i) for i in range(self.n_ind)]
+
+    def set_fitness(self, fitness, fitness_unconst):
+        self.fitness = array(fitness, dtype=float).reshape(self.n_ind, -1)
+        self.fitness_unconst = array(fitness_unconst, dtype=float).reshape(self.n_ind, -1)
+
+    def merge(self, other, take_other):
+        """
+        merge(other, take_other): New population holding other's individual
+                                  where take_other is True and this one's elsewhere.
+        """
+        take = asarray(take_other, dtype=bool)
+        col = take[:, None]
+        members = None
+        if self.members is not None and other.members is not None:
+            members = [o if t else s for s, o, t in zip(self.members, other.members, take)]
+        return Population(where(col, other.x, self.x), self.base_props, self.sys_num,
+                where(col, other.fitness, self.fitness),
+                where(col, other.fitness_unconst, self.fitness_unconst), members)
+
+    def __len__(self):
+        return self.n_ind
+
+    def __getitem__(self, i):
+        if self.members is not None:
+            return self.members[i]
+        ind = Ind(self.props(i), self.sys_num)
+        if self.fitness is not None:
+            ind._fitness = self.fitness[i].tolist()
+            ind.fitness_unconst = self.fitness_unconst[i].tolist()
+        return ind
+
+    def __iter__(self):
+        for i in range(self.n_ind):
+            yield self[i]
@@ -0,0 +1,147 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Results
+  Purpose: Single-pass parsing of NASTRAN F06 output files into result objects
+           that are shared by all fitness and constraint functions.
+"""
+from pyequalizer.fileops import *
+
+_failed_value = 1.0*10**10 # Absurdly high value used when a result can't be read.
+
+class f06_result(object):
+    """
+    Class 'f06_result'
+
+    Everything the optimizer needs from a single NASTRAN output file,
+    gathered in one pass over the file.
+
+    Properties:
+    fname: Name of the F06 file the result was read from.
+    mass: Nastran-calculated mass.
+    table: stress_table holding every row of the CQUAD4 stress tables.
+    stresses: List of [sx, sy, txy] values, one per CQUAD4 element, taken from
+              the first line of each element in the stress table.
+    voigt: The same values as an (n_elem, 3) array.
+    element_ids: Element ID of each row of voigt.
+    subcases: Dictionary from subcase ID to the [start, stop) rows of table
+              holding that subcase's stresses.
+    max_stress: Maximum von mises stress over every line of the CQUAD4 stress tables.
+    max_stress_loc: Element ID field of the line pair holding max_stress.
+    fatal: True if the solver reported a fatal message.
+    found: False if the file could not be read at all.
+    """
+    def __init__(self, fname, mass, table, fatal = False, found = True, subcases = None):
+        self.fname = fname
+        self.mass = mass
+        self.table = table
+        self.subcases = subcases if subcases is not None else {1: (0, len(table))}
+        self.fatal = fatal
+        self.found = found
+        self.max_stress = 0
+        self.max_stress_loc = None
+        if not self.ok:
+            self.mass = _failed_value
+            self.max_stress = _failed_value
+        elif len(table) > 0:
+            vm = table.von_mises
+            i = int(argmax(vm))
+            self.max_stress = max(0, float(vm[i]))
+            self.max_stress_loc = table.loc[i].decode()
+
+    @classmethod
+    def failed(cls, fname):
+        """
+        Build the result used for a file that could not be read.
+        Mass and stress are set absurdly high so the design is never selected.
+        """
+        return cls(fname, _failed_value, stress_table([]), found = False)
+
+    @property
+    def ok(self):
+        return self.found and not self.fatal
+
+    @property
+    def stresses(self):
+        return self.table.center_stresses
+
+    @property
+    def voigt(self):
+        return self.table.center_voigt
+
+    def subcase_table(self, subcase):
+        """
+        subcase_table(subcase): stress_table of a single subcase. Empty if the 
+                                subcase is not in the file. 
+        """
+        start, stop = self.subcases.get(subcase, (0, 0))
+        return self.table.rows(start, stop)
+
+    @property
+    def element_ids(self):
+        return self.table.center_eids
+
+    def __str__(self):
+        out = "***F06 RESULT***"
+        out += "\nFile:\n{}".format(self.fname)
+        out += "\nMass:\n{}".format(self.mass)
+        out += "\nMax Stress:\n{}".format(self.max_stress)
+        out += "\nFatal:\n{}".format(self.fatal)
+        return out + "\n\n"
+
+def parse_f06(f06_name, elements = None):
+    """
+    parse_f06(f06_name, elements): Read mass, CQUAD4 stresses and fatal flags from an
+                                   F06 file in a single pass.
+    If elements (a set of element IDs) is given, only the stresses of those
+    elements are read, and max_stress covers only them.
+    Raises IOError if the file cannot be opened.
+    """
+    with open(f06_name, 'rb') as f:
+        data = f.read()
+    mass_val = _failed_value
+    p = data.find(b'MASS')
+    while p >= 0:
+        # The mass is on the line after the one with MASS in columns 47-51. 
+        start = data.find(b'\n', p) + 1
+        if start > 0 and p - (data.rfind(b'\n', 0, p) + 1) == 47:
+            stop = data.find(b'\n', start)
+            line = data[start:stop if stop >= 0 else len(data)]
+            mass_val = float(line[41:56].replace(b'D', b'E'))
+            break
+        p = data.find(b'MASS', p + 1)
+    fatal = b'FATAL' in data
+    by_subcase = {}
+    for subcase, starts, lens in find_stress_blocks(data, elements):
+        by_subcase.setdefault(subcase, []).append([starts, lens])
+    parts = []
+    subcases = {}
+    n = 0
+    for subcase, blocks in by_subcase.items():
+        size = sum(len(b[0]) for b in blocks)
+        subcases[subcase] = (n, n + size)
+        n += size
+        parts.extend(blocks)
+    starts = concatenate([zeros(0, dtype=int)] + [b[0] for b in parts])
+    lens = concatenate([zeros(0, dtype=int)] + [b[1] for b in parts])
+    table = stress_table.from_lines(data, starts, lens)
+    return f06_result(f06_name, mass_val, table, fatal, subcases = subcases)
+
+def read_f06(f06_name, elements = None):
+    """
+    read_f06(f06_name, elements): Parse an F06 file, retrying a few times if it is not
+                                  readable yet. Returns a failed result if it never is.
+    """
+    for i in range(5):
+        try:
+            return parse_f06(f06_name, elements)
+        except Exception as e:
+            print("ERROR: {}".format(e))
+    return f06_result.failed(f06_name)
+
+def read_results(files, elements = None):
+    """
+    read_results(files, elements): Read the result for each nastran input deck in files.
+    """
+    return [read_f06(f + ".out", elements) for f in files]
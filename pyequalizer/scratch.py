@@ -0,0 +1,88 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Scratch
+  Purpose: Isolated scratch directories for solver jobs, so that several
+           systems and several optimizer processes never share deck or
+           output file names.
+"""
+from tempfile import mkdtemp
+import shutil
+import weakref
+import os
+
+class scratch_space(object):
+    """
+    Class 'scratch_space'
+
+    Hands out one directory per system, generation and individual below a
+    run directory that is unique to this scratch_space:
+
+        root/run-XXXXXX/sys-<sys_num>/gen-<gen>/ind-<ind>/
+
+    The run directory is only made when it is first needed. Unless keep is
+    set, it is removed by cleanup(), or failing that when the scratch_space
+    is garbage collected or the interpreter exits. Copies pickled to other
+    processes share the run directory but leave its removal to the original.
+
+    Properties:
+    root: Directory the run directory is created in.
+    path: The run directory.
+    keep: If False, a generation's directories are removed by release().
+    """
+    def __init__(self, root = "/tmp/nastran", keep = False):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.keep = keep
+        self._path = None
+        self._finalizer = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._path = mkdtemp(prefix = "run-", dir = self.root)
+            if not self.keep:
+                self._finalizer = weakref.finalize(self, shutil.rmtree, self._path, True)
+        return self._path
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_path'] = self.path
+        state['_finalizer'] = None
+        return state
+
+    def gen_dir(self, sys_num, gen):
+        return os.path.join(self.path, "sys-{}".format(sys_num), "gen-{}".format(gen))
+
+    def job_dir(self, sys_num, gen, ind):
+        """
+        job_dir(sys_num, gen, ind): Directory for one individual, created if needed.
+        """
+        d = os.path.join(self.gen_dir(sys_num, gen), "ind-{}".format(ind))
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    def deck_names(self, sys_num, gen, n, name = "optim"):
+        """
+        deck_names(sys_num, gen, n, name): Input deck file names for n individuals
+                                           of a generation, each in its own directory.
+        """
+        return [os.path.join(self.job_dir(sys_num, gen, i), name + ".dat") for i in range(n)]
+
+    def release(self, sys_num, gen):
+        """
+        release(sys_num, gen): Remove a generation's directories unless keep is set.
+        """
+        if not self.keep and self._path is not None:
+            shutil.rmtree(self.gen_dir(sys_num, gen), ignore_errors = True)
+
+    def cleanup(self):
+        """
+        cleanup(): Remove the whole run directory unless keep is set.
+        """
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+        if not self.keep and self._path is not None:
+            shutil.rmtree(self._path, ignore_errors = True)
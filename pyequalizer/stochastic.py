@@ -0,0 +1,164 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Stochastic
+  Purpose: Second order Taylor estimate of the mean and standard deviation of
+           von Mises stress under two normally distributed loads, evaluated
+           for a whole stack of elements and individuals at once.
+"""
+from numpy import asarray, einsum, eye, trace, sqrt, ndarray
+from multiprocessing import get_context, resource_tracker, current_process
+from multiprocessing.shared_memory import SharedMemory
+from math import ceil
+import os
+
+def deviators(tensors):
+    """
+    deviators(tensors): Deviatoric part of a stack of 3x3 tensors of shape (..., 3, 3).
+    """
+    t = asarray(tensors, dtype=float)
+    return t - eye(3) * (trace(t, axis1=-2, axis2=-1) / 3.0)[..., None, None]
+
+def stochastic_von_mises(sd_x, sd_y, mu_x, sigma_x, mu_y, sigma_y):
+    """
+    stochastic_von_mises(sd_x, sd_y, mu_x, sigma_x, mu_y, sigma_y):
+        Mean (E_svm) and standard deviation (sigma_svm) of von Mises stress
+        for stress = sd_x * P_x + sd_y * P_y, with P_x ~ N(mu_x, sigma_x) and
+        P_y ~ N(mu_y, sigma_y) independent.
+
+    Inputs:
+        sd_x, sd_y: Unit load deviators, stacks of shape (..., 3, 3),
+                    e.g. (n_ind, n_elem, 3, 3).
+    Outputs:
+        [E_svm, sigma_svm]: Arrays of shape (...), e.g. (n_ind, n_elem).
+    """
+    # Traces of the products of the deviators, e.g. xy = tr(sd_x @ sd_y).
+    xx = einsum('...ij,...ji->...', sd_x, sd_x)
+    xy = einsum('...ij,...ji->...', sd_x, sd_y)
+    yx = einsum('...ij,...ji->...', sd_y, sd_x)
+    yy = einsum('...ij,...ji->...', sd_y, sd_y)
+
+    alpha = xx * mu_x**2 + (xy + yx) * mu_x * mu_y + yy * mu_y**2
+    fd_alpha_px = xx * 2 * mu_x + (xy + yx) * mu_y
+    sd_alpha_px = xx * 2
+    fd_alpha_py = (xy + yx) * mu_x + yy * 2 * mu_y
+    sd_alpha_py = yy * 2
+
+    s_vm = sqrt(3/2 * alpha)
+    fd_svm_px = (3/2)**0.5 * ((1/2) * alpha**-0.5 * fd_alpha_px)
+    sd_svm_px = ((3/2)**0.5 * (((1/2) * sd_alpha_px * alpha**-0.5) +
+        ((-1/4) * alpha**(-3/2) * fd_alpha_px**2)))
+    fd_svm_py = (3/2)**0.5 * ((1/2) * alpha**-0.5 * fd_alpha_py)
+    sd_svm_py = ((3/2)**0.5 * (((1/2) * sd_alpha_py * alpha**-0.5) +
+        ((-1/4) * alpha**(-3/2) * fd_alpha_py**2)))
+
+    E_svm = s_vm + (1/2) * (sd_svm_px * sigma_x**2 + sd_svm_py * sigma_y**2)
+    sigma_svm = sqrt(((fd_svm_px * sigma_x)**2) + ((fd_svm_py * sigma_y)**2) +
+            ((1/4) * ((sd_svm_px * sigma_x**2)**2 + (sd_svm_py * sigma_y**2)**2)))
+    return [E_svm, sigma_svm]
+
+
+def _stochastic_task(args):
+    """
+    Worker side of stochastic_pool: compute rows [lo, hi) of the block in place.
+    """
+    name, n_ind, n_elem, lo, hi, loads = args
+    dev_shape = (n_ind, n_elem, 3, 3)
+    dev_bytes = n_ind * n_elem * 9 * 8
+    shm = SharedMemory(name = name)
+    try:
+        sd_x = ndarray(dev_shape, dtype = float, buffer = shm.buf)
+        sd_y = ndarray(dev_shape, dtype = float, buffer = shm.buf, offset = dev_bytes)
+        res = ndarray((2, n_ind, n_elem), dtype = float, buffer = shm.buf, offset = 2 * dev_bytes)
+        E_svm, sigma_svm = stochastic_von_mises(sd_x[lo:hi], sd_y[lo:hi], *loads)
+        res[0, lo:hi] = E_svm
+        res[1, lo:hi] = sigma_svm
+        del sd_x, sd_y, res, E_svm, sigma_svm
+    finally:
+        shm.close()
+
+class stochastic_pool(object):
+    """
+    Class 'stochastic_pool'
+
+    Long-lived worker processes for stochastic_von_mises. Each call copies
+    the stacked deviators into one shared memory block, the workers each
+    compute a range of individuals in place, and the results are read back
+    from the same block, so nothing but the block's name is pickled.
+
+    The processes are started on first use and kept until close(). Batches
+    smaller than min_rows individuals are computed in the calling process,
+    where the vectorized math is cheaper than any hand-off. A pickled
+    stochastic_pool (e.g. inside a system sent to another process) arrives
+    without processes and starts its own when needed, except in a daemonic
+    process (e.g. an optimize_systems worker), which may not have children:
+    there every batch is computed in the calling process.
+
+    Properties:
+    n_workers: Number of worker processes. Defaults to the CPU count.
+    min_rows: Smallest number of individuals handed to the workers.
+    """
+    def __init__(self, n_workers = None, min_rows = 256):
+        self.n_workers = n_workers if n_workers else (os.cpu_count() or 1)
+        self.min_rows = min_rows
+        self._pool = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def start(self):
+        """
+        start(): Start the worker processes, if they are not running.
+        """
+        if self._pool is None:
+            # Workers forked after the resource tracker is up share it, so a
+            # block they open is not unlinked (or reported leaked) when they exit. 
+            resource_tracker.ensure_running()
+            self._pool = get_context("fork").Pool(self.n_workers)
+        return self._pool
+
+    def close(self):
+        """
+        close(): Stop the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, sd_x, sd_y, mu_x, sigma_x, mu_y, sigma_y):
+        """
+        run(sd_x, sd_y, mu_x, sigma_x, mu_y, sigma_y): Same as stochastic_von_mises
+        for (n_ind, n_elem, 3, 3) deviator stacks.
+        """
+        n_ind, n_elem = sd_x.shape[:2]
+        loads = (mu_x, sigma_x, mu_y, sigma_y)
+        if self.n_workers <= 1 or n_ind < self.min_rows or current_process().daemon:
+            return stochastic_von_mises(sd_x, sd_y, *loads)
+        pool = self.start()
+        dev_bytes = n_ind * n_elem * 9 * 8
+        shm = SharedMemory(create = True, size = 2 * dev_bytes + 2 * n_ind * n_elem * 8)
+        try:
+            dev_shape = (n_ind, n_elem, 3, 3)
+            ndarray(dev_shape, dtype = float, buffer = shm.buf)[:] = sd_x
+            ndarray(dev_shape, dtype = float, buffer = shm.buf, offset = dev_bytes)[:] = sd_y
+            step = int(ceil(n_ind / self.n_workers))
+            tasks = [(shm.name, n_ind, n_elem, lo, min(lo + step, n_ind), loads)
+                    for lo in range(0, n_ind, step)]
+            pool.map(_stochastic_task, tasks)
+            res = ndarray((2, n_ind, n_elem), dtype = float, buffer = shm.buf, offset = 2 * dev_bytes)
+            out = [res[0].copy(), res[1].copy()]
+            del res
+            return out
+        finally:
+            shm.close()
+            shm.unlink()
@@ -1,4 +1,4 @@
-from numpy import array, add, trace, eye, size, shape, tensordot
+from numpy import array, add, trace, eye, size, shape, tensordot, asarray, zeros
 
 class stress_tensor(object):
     def __init__(self, sx, sy, sz, txy, tyz, tzx):
@@ -9,6 +9,7 @@ class stress_tensor(object):
         TYZ = float(tyz)
         TZX = float(tzx)
         self._tensor = array([[SX, TXY, TZX],[TXY,SY,TYZ],[TZX,TYZ,SZ]])
+        self._tensor.flags.writeable = False # Shared by tensor and copies of the object.
 
     @classmethod
     def _from_array(self, a):
@@ -41,4 +42,39 @@ class stress_tensor(object):
             return NotImplemented
     __rmul__ = __mul__
 
+def plane_tensors(voigt):
+    """
+    plane_tensors(voigt): Full (n, 3, 3) plane stress tensors from an (n, 3)
+                          array of [sx, sy, txy] rows.
+    """
+    v = asarray(voigt, dtype=float)
+    t = zeros(v.shape[:-1] + (3, 3))
+    t[..., 0, 0] = v[..., 0]
+    t[..., 1, 1] = v[..., 1]
+    t[..., 0, 1] = v[..., 2]
+    t[..., 1, 0] = v[..., 2]
+    return t
 
+class voigt_tensors(object):
+    """
+    Class 'voigt_tensors'
+
+    Read-only sequence of stress_tensor objects over an (n, 3) array of
+    [sx, sy, txy] rows. Each stress_tensor is built when it is indexed, so
+    only the compact array is kept in memory.
+    """
+    def __init__(self, voigt):
+        self.voigt = voigt
+
+    def __len__(self):
+        return len(self.voigt)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        sx, sy, txy = self.voigt[i]
+        return stress_tensor(sx, sy, 0, txy, 0, 0)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
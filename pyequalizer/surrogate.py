@@ -0,0 +1,165 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Surrogate
+  Purpose: Gaussian process model of fitness over the design variables, used
+           to skip solver runs for trial vectors that are unlikely to win
+           differential evolution selection.
+"""
+from numpy import (asarray, vstack, exp, log1p, sign, sqrt, median, maximum,
+        ones, abs as np_abs, prod, triu_indices, einsum)
+from scipy.linalg import cho_factor, cho_solve
+from scipy.stats import norm
+
+def _signed_log(y):
+    """
+    Compress the scale of fitness values, which penalty multipliers can push
+    up by many orders of magnitude, while keeping their order.
+    """
+    return sign(y) * log1p(np_abs(y))
+
+class gp_surrogate(object):
+    """
+    Class 'gp_surrogate'
+
+    Gaussian process regression of each fitness objective over the design
+    variables, with a squared exponential kernel. Inputs are standardized,
+    outputs are put through a signed log and standardized, and the length
+    scale is the median distance between training points.
+
+    Before a trial generation is solved, screen() gives each trial vector's
+    probability of winning selection against its parent: the probability
+    that every predicted objective is no worse than the parent's, treating
+    objectives as independent normals. Trials below threshold are not sent
+    to the solver, except for a random explore fraction of them, which keeps
+    the model honest about regions it predicts badly.
+
+    After the solved trials are known, record() compares the predictions
+    with the actual outcomes. history keeps one entry per generation.
+
+    Properties:
+    threshold: Smallest win probability for a trial to be solved.
+    explore: Fraction of the screened-out trials solved anyway.
+    min_points: Number of observations before any trial is screened out.
+    max_points: Most recent observations kept for fitting.
+    noise: Diagonal term added to the kernel matrix, relative to unit variance.
+    history: List of dictionaries, one per screened generation, with keys
+             trials, solved, skipped, explored, predicted_wins, actual_wins,
+             correct (solved trials whose win/lose outcome was predicted
+             correctly) and mae (mean absolute error of the predicted
+             objectives of solved trials, in signed log units).
+    """
+    def __init__(self, threshold = 0.05, explore = 0.1, min_points = 20,
+            max_points = 500, noise = 1e-6):
+        self.threshold = threshold
+        self.explore = explore
+        self.min_points = min_points
+        self.max_points = max_points
+        self.noise = noise
+        self.history = []
+        self._x = None
+        self._y = None
+        self._model = None
+        self._pending = None
+
+    def __len__(self):
+        return 0 if self._x is None else len(self._x)
+
+    def observe(self, x, fitness):
+        """
+        observe(x, fitness): Add evaluated design variables (n, n_var) and their
+                             fitness (n, n_obj) to the training set.
+        """
+        x = asarray(x, dtype = float)
+        y = asarray(fitness, dtype = float).reshape(len(x), -1)
+        if len(x) == 0:
+            return
+        if self._x is None:
+            self._x, self._y = x.copy(), y.copy()
+        else:
+            self._x = vstack([self._x, x])[-self.max_points:]
+            self._y = vstack([self._y, y])[-self.max_points:]
+        self._model = None
+
+    def _fit(self):
+        x, y = self._x, _signed_log(self._y)
+        x_mu, x_sd = x.mean(axis = 0), x.std(axis = 0)
+        x_sd[x_sd == 0] = 1.0
+        y_mu, y_sd = y.mean(axis = 0), y.std(axis = 0)
+        y_sd[y_sd == 0] = 1.0
+        xs = (x - x_mu) / x_sd
+        d2 = ((xs[:, None, :] - xs[None, :, :])**2).sum(axis = 2)
+        iu = triu_indices(len(xs), 1)
+        ell2 = median(d2[iu]) if len(iu[0]) else 1.0
+        ell2 = ell2 if ell2 > 0 else 1.0
+        K = exp(-0.5 * d2 / ell2)
+        K[range(len(K)), range(len(K))] += self.noise
+        factor = cho_factor(K, lower = True)
+        alpha = cho_solve(factor, (y - y_mu) / y_sd)
+        self._model = (xs, x_mu, x_sd, y_mu, y_sd, ell2, factor, alpha)
+
+    def predict(self, x):
+        """
+        predict(x): Mean and standard deviation of the fitness of design variables
+                    x (m, n_var), as two (m, n_obj) arrays in signed log units.
+        """
+        if self._model is None:
+            self._fit()
+        xs, x_mu, x_sd, y_mu, y_sd, ell2, factor, alpha = self._model
+        q = (asarray(x, dtype = float) - x_mu) / x_sd
+        d2 = ((q[:, None, :] - xs[None, :, :])**2).sum(axis = 2)
+        k = exp(-0.5 * d2 / ell2)
+        mean = k @ alpha
+        var = maximum(1.0 + self.noise - einsum('ij,ji->i', k, cho_solve(factor, k.T)), 1e-12)
+        return [mean * y_sd + y_mu, sqrt(var)[:, None] * y_sd]
+
+    def win_probability(self, x, parent_fitness):
+        """
+        win_probability(x, parent_fitness): Probability that each trial in x is no
+                                            worse than its parent in every objective.
+        """
+        return self._win_probability(self.predict(x), parent_fitness)
+
+    def _win_probability(self, prediction, parent_fitness):
+        mean, sd = prediction
+        target = _signed_log(asarray(parent_fitness, dtype = float))
+        return prod(norm.cdf((target - mean) / sd), axis = 1)
+
+    def screen(self, x, parent_fitness, rng):
+        """
+        screen(x, parent_fitness, rng): Boolean mask of the trials in x to solve.
+        Every trial is solved until min_points observations are available.
+        """
+        n = len(x)
+        if len(self) < max(self.min_points, 2):
+            self._pending = None
+            return ones(n, dtype = bool)
+        prediction = self.predict(x)
+        promising = self._win_probability(prediction, parent_fitness) >= self.threshold
+        explored = ~promising & (rng.random(n) < self.explore)
+        self._pending = (prediction[0], promising, explored)
+        return promising | explored
+
+    def record(self, solved_fitness, won):
+        """
+        record(solved_fitness, won): Score the last screen() against the solved
+        trials' fitness and whether they won selection. Both only cover the
+        solved trials, in the order they appear in the screened generation.
+        Returns the history entry, or None if the last generation was not screened.
+        """
+        if self._pending is None:
+            return None
+        predicted, promising, explored = self._pending
+        self._pending = None
+        solved = promising | explored
+        mean = predicted[solved]
+        actual = _signed_log(asarray(solved_fitness, dtype = float)).reshape(mean.shape)
+        won = asarray(won, dtype = bool)
+        entry = {'trials': len(solved), 'solved': int(solved.sum()),
+                'skipped': int((~solved).sum()), 'explored': int(explored.sum()),
+                'predicted_wins': int(promising[solved].sum()), 'actual_wins': int(won.sum()),
+                'correct': int((promising[solved] == won).sum()),
+                'mae': float(np_abs(mean - actual).mean()) if len(actual) else 0.0}
+        self.history.append(entry)
+        return entry
@@ -0,0 +1,44 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Bulk
+  Purpose: Card indexing of bulk_deck.
+"""
+import os
+from pyequalizer.bulk import bulk_deck, bulk_span
+from pyequalizer.fileops import load_from_file, read_cards, strip_card, is_prop_header
+
+_model = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "models", "test_open.dat")
+
+_deck = [
+    "SOL 101\n",
+    "CEND\n",
+    "SUBCASE 99999\n",
+    "  LOAD = 12345678\n",
+    "BEGIN BULK\n",
+    "PSHELL         1       1      2.       1               1              0.\n",
+    "CQUAD4        10       1       1       2       3       4\n",
+    "ENDDATA\n",
+    "CQUAD4     77777       1       1       2       3       4\n",
+]
+
+def test_only_bulk_data_is_indexed():
+    deck = bulk_deck(_deck)
+    assert bulk_span(_deck) == [5, 7]
+    assert [c.name for c in deck.cards] == ["PSHELL", "CQUAD4"]
+    assert max(c.id for c in deck.cards if c.id is not None) == 10
+    assert deck.lines_without(["PSHELL"]) == _deck[:5] + _deck[6:]
+
+def test_deck_without_begin_bulk():
+    lines = _deck[5:7]
+    assert bulk_span(lines) == [0, 2]
+    assert len(bulk_deck(lines).cards) == 2
+
+def test_matches_line_readers():
+    lines = load_from_file(_model)
+    deck = bulk_deck(lines)
+    assert deck.fields(["PBAR", "PSHELL"]) == read_cards(lines, is_prop_header)
+    assert deck.lines_without(["PBAR", "PSHELL"]) == strip_card(lines, is_prop_header)
+    assert "CEND" not in deck.by_type
@@ -0,0 +1,79 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Cache
+  Purpose: Keys, storage and least-recently-used eviction of run_cache,
+           including several instances sharing one directory.
+"""
+import os
+import pytest
+from pyequalizer import cache
+from pyequalizer.cache import run_cache
+
+def age(c, key, t):
+    os.utime(c._entry(key), (t, t))
+
+def test_key(tmp_path):
+    c = run_cache(str(tmp_path))
+    deck = tmp_path / "job.dat"
+    deck.write_bytes(b"SOL 101\nCEND\n")
+    assert c.key(str(deck)) == c.key(b"SOL 101\nCEND\n")
+    assert c.key(b"SOL 101\nCEND\n", "nastran") != c.key(b"SOL 101\nCEND\n", "other")
+    assert c.key(b"SOL 101\nCEND\n") != c.key(b"SOL 101\nCEND \n")
+
+def test_get_put(tmp_path):
+    c = run_cache(str(tmp_path))
+    assert c.get("a") is None and c.misses == 1
+    c.put("a", {"mass": 1.5})
+    assert c.get("a") == {"mass": 1.5} and c.hits == 1
+    assert run_cache(str(tmp_path)).get("a") == {"mass": 1.5}
+    assert len(c) == 1
+    assert [x for x in os.listdir(str(tmp_path))] == ["a.pickle"]
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    c = run_cache(str(tmp_path))
+    (tmp_path / "a.pickle").write_bytes(b"")
+    assert c.get("a") is None and c.misses == 1
+
+def test_evicts_least_recently_used(tmp_path):
+    c = run_cache(str(tmp_path), max_entries = 3)
+    for t, key in enumerate("abc"):
+        c.put(key, key)
+        age(c, key, 1000 + t)
+    c.get("a") # Now the most recently used.
+    c.put("d", "d")
+    assert sorted(x[0] for x in os.listdir(str(tmp_path))) == ["a", "c", "d"]
+
+def test_evicts_by_bytes(tmp_path):
+    c = run_cache(str(tmp_path), max_entries = None)
+    c.put("a", b"x" * 1000)
+    age(c, "a", 1000)
+    c.max_bytes = 1500
+    c.put("b", b"x" * 1000)
+    assert c.get("a") is None and c.get("b") == b"x" * 1000
+
+def test_opening_enforces_limits(tmp_path):
+    c = run_cache(str(tmp_path))
+    for t, key in enumerate("abcd"):
+        c.put(key, key)
+        age(c, key, 1000 + t)
+    assert len(run_cache(str(tmp_path), max_entries = 2)) == 2
+    assert sorted(os.listdir(str(tmp_path))) == ["c.pickle", "d.pickle"]
+
+def test_shared_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_rescan", 4)
+    # Two workers, as with -P 2, each below the limit on its own.
+    first = run_cache(str(tmp_path), max_entries = 10)
+    second = run_cache(str(tmp_path), max_entries = 10)
+    for i in range(20):
+        (first if i % 2 else second).put("k{:02d}".format(i), i)
+        age(first, "k{:02d}".format(i), 1000 + i)
+    assert len(os.listdir(str(tmp_path))) <= 10 + 2 * cache._rescan
+    first.evict()
+    assert len(os.listdir(str(tmp_path))) == 10
+    # Entries the other worker wrote and used recently are kept.
+    assert second.get("k10") == 10
+    first.put("k20", 20)
+    first.evict()
+    assert first.get("k10") == 10 and first.get("k11") is None
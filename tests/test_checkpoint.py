@@ -0,0 +1,74 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Checkpoint
+  Purpose: checkpoint_store, and resuming optimize_system after a crash,
+           driven by fake_nastran.py.
+"""
+import os
+import random
+import numpy
+import pytest
+import pyequalizer as pe
+from pyequalizer import checkpoint
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_model = os.path.join(_root, "models", "test_open.dat")
+_binary = os.path.join(_root, "fake_nastran.py")
+
+def test_store(tmp_path):
+    store = pe.checkpoint_store(str(tmp_path))
+    store.save("a", {"x": 1})
+    store.save("a", {"x": 2})
+    assert store.load("a") is None # Not resuming.
+    again = pe.checkpoint_store(str(tmp_path), resume = True)
+    assert again.load("a") == {"x": 2}
+    assert again.load("b") is None
+    assert os.listdir(str(tmp_path)) == ["a.ckpt"]
+
+def test_version_mismatch(tmp_path, monkeypatch):
+    pe.checkpoint_store(str(tmp_path)).save("a", {"x": 1})
+    monkeypatch.setattr(checkpoint, "_version", checkpoint._version + 1)
+    assert pe.checkpoint_store(str(tmp_path), resume = True).load("a") is None
+
+def make(kind, tmp_path, binary = _binary):
+    random.seed(1)
+    numpy.random.seed(1)
+    scratch = pe.scratch_space(str(tmp_path / "scratch"))
+    if kind == "unit":
+        return pe.system_unit(1, _model, 1, 6, pe.test_open_force_pack(1,1000,0,0),
+                pe.test_open_force_pack(1,0,1000,0), pe.nr_var(0,5000), pe.nr_var(150000,19500),
+                binary = binary, scratch = scratch, seed = 3)
+    return pe.system(0, _model, 1, 6, [pe.cost_mass, pe.cost_stress],
+            [pe.const_beta, pe.const_mass], binary = binary, scratch = scratch, seed = 1)
+
+class crash(Exception):
+    pass
+
+def crash_at(n):
+    def check(archive, vec, ctr):
+        if archive.generation == n:
+            raise crash()
+        return [False, ctr]
+    return check
+
+def front_key(front):
+    return sorted((tuple(numpy.ravel(i.fitness)), tuple(p[3] for p in i.props)) for i in front)
+
+@pytest.mark.parametrize("kind", ["plain", "unit"])
+def test_resume_matches_uninterrupted_run(tmp_path, kind):
+    ref = front_key(pe.optimize_system(make(kind, tmp_path), 0, 3))
+    path = str(tmp_path / "ckpt")
+    with pytest.raises(crash):
+        pe.optimize_system(make(kind, tmp_path), 0, 3, converged_func = crash_at(3),
+                checkpoint = pe.checkpoint_store(path))
+    state = pe.checkpoint_store(path, resume = True).load(checkpoint.system_key(0))
+    assert not state["done"] and state["next_gen"] == 1
+    resumed = front_key(pe.optimize_system(make(kind, tmp_path), 0, 3,
+        checkpoint = pe.checkpoint_store(path, resume = True)))
+    assert resumed == ref
+    # A finished system is returned from its checkpoint without solving.
+    idle = make(kind, tmp_path, str(tmp_path / "no_solver"))
+    again = pe.optimize_system(idle, 0, 3, checkpoint = pe.checkpoint_store(path, resume = True))
+    assert front_key(again) == ref
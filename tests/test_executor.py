@@ -0,0 +1,152 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Executor
+  Purpose: Timeouts, retries and failure reporting of solver_executor and
+           system.solve.
+"""
+import asyncio
+import os
+import stat
+import time
+import pytest
+from multiprocessing import BoundedSemaphore
+from pyequalizer.executor import solver_executor, SolverError, set_solver_slots
+from pyequalizer.fileops import run_nastran
+from pyequalizer import system, cost_mass
+from pyequalizer.cache import run_cache
+
+_model = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "models", "test_open.dat")
+
+def script(path, body):
+    """
+    Write an executable shell script to path and return its name.
+    """
+    with open(path, 'w') as f:
+        f.write("#!/bin/sh\n" + body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return str(path)
+
+def deck(tmp_path, name = "job.dat"):
+    fname = tmp_path / name
+    fname.write_text("BEGIN BULK\nENDDATA\n")
+    return str(fname)
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie still answers signal 0; it is gone for every other purpose.
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+def pids(fname):
+    with open(fname) as f:
+        return [int(l) for l in f.read().split()]
+
+def test_success(tmp_path):
+    binary = script(tmp_path / "ok.sh", 'echo done > "$1.out"\n')
+    [res] = solver_executor(1).run(binary, [deck(tmp_path)])
+    assert res.ok and res.attempts == 1 and not res.timed_out
+    assert (tmp_path / "job.dat.out").read_text() == "done\n"
+
+def test_failure_is_retried(tmp_path):
+    binary = script(tmp_path / "fail.sh", 'echo x >> "$1.tries"\nexit 3\n')
+    [res] = solver_executor(1, retries = 2).run(binary, [deck(tmp_path)])
+    assert not res.ok and res.returncode == 3 and res.attempts == 3
+    assert len((tmp_path / "job.dat.tries").read_text().split()) == 3
+
+def test_missing_binary(tmp_path):
+    [res] = solver_executor(1, retries = 1).run(str(tmp_path / "nope"), [deck(tmp_path)])
+    assert not res.ok and res.error and res.attempts == 2
+
+def test_timeout_kills_before_retry(tmp_path):
+    log = tmp_path / "pids"
+    binary = script(tmp_path / "slow.sh", 'echo $$ >> "{}"\nexec sleep 30\n'.format(log))
+    start = time.time()
+    [res] = solver_executor(1, timeout = 0.5, retries = 1).run(binary, [deck(tmp_path)])
+    assert time.time() - start < 10
+    assert res.timed_out and not res.ok and res.error is None
+    assert res.attempts == 2
+    assert len(pids(log)) == 2
+    assert not any(alive(p) for p in pids(log))
+
+def test_cancel_kills_solver(tmp_path):
+    log = tmp_path / "pids"
+    binary = script(tmp_path / "slow.sh", 'echo $$ >> "{}"\nexec sleep 30\n'.format(log))
+    async def cancel_soon():
+        task = asyncio.ensure_future(solver_executor(1).run_all(binary, [deck(tmp_path)]))
+        while not log.exists():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancel_soon())
+    assert not any(alive(p) for p in pids(log))
+
+def test_timeout_kills_grandchildren(tmp_path):
+    log = tmp_path / "pids"
+    # Like a "nastran" wrapper script, which starts the real solver and waits on it. 
+    binary = script(tmp_path / "wrapper.sh",
+            'sleep 30 &\necho $! >> "{}"\nwait\n'.format(log))
+    [res] = solver_executor(1, timeout = 0.5).run(binary, [deck(tmp_path)])
+    assert res.timed_out
+    time.sleep(0.2)
+    assert not any(alive(p) for p in pids(log))
+
+def test_shared_slots_limit_jobs(tmp_path):
+    binary = script(tmp_path / "slow.sh", 'sleep 0.3\n')
+    set_solver_slots(BoundedSemaphore(1))
+    try:
+        start = time.time()
+        res = solver_executor(2).run(binary, [deck(tmp_path, "a.dat"), deck(tmp_path, "b.dat")])
+        wall = time.time() - start
+    finally:
+        set_solver_slots(None)
+    assert all(r.ok for r in res) and wall >= 0.6
+    # Time spent waiting for the shared slot is not solver time.
+    assert sum(r.elapsed for r in res) < wall + 0.1
+
+def solve_with(tmp_path, body, cache = None):
+    binary = script(tmp_path / "solver.sh", body)
+    s = system(0, _model, 1, 2, [cost_mass], [], binary = binary, cache = cache)
+    return s.solve([deck(tmp_path)])
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_missing_output_fails(tmp_path, cache):
+    with pytest.raises(SolverError) as e:
+        solve_with(tmp_path, "exit 0\n", run_cache(str(tmp_path / "cache")) if cache else None)
+    assert "no output file" in str(e.value)
+
+def test_fatal_output_fails(tmp_path):
+    with pytest.raises(SolverError) as e:
+        solve_with(tmp_path, 'echo "*** USER FATAL MESSAGE 2025" > "$1.out"\n')
+    [job] = e.value.failed
+    assert job.returncode == 0 and not job.ok
+    assert "fatal" in str(e.value)
+
+def test_bad_output_is_retried(tmp_path):
+    # First attempt writes a fatal message, the second a clean result.
+    binary = script(tmp_path / "flaky.sh",
+            'if [ -e "$1.tried" ]; then echo ok > "$1.out"; else touch "$1.tried"; '
+            'echo "*** USER FATAL MESSAGE" > "$1.out"; fi\n')
+    [res] = run_nastran(binary, [deck(tmp_path)], solver_executor(1, retries = 1))
+    assert res.ok and res.attempts == 2
+    with pytest.raises(SolverError) as e:
+        run_nastran(binary, [deck(tmp_path, "other.dat")], solver_executor(1))
+    assert "fatal" in str(e.value)
+
+def test_validate_sees_every_clean_attempt(tmp_path):
+    binary = script(tmp_path / "ok.sh", 'exit 0\n')
+    seen = []
+    def validate(job):
+        seen.append(job.attempts)
+        return "bad" if job.attempts < 3 else None
+    [res] = solver_executor(1, retries = 3).run(binary, [deck(tmp_path)], validate = validate)
+    assert res.ok and res.attempts == 3 and seen == [1, 2, 3]
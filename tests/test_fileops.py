@@ -0,0 +1,102 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test FileOps
+  Purpose: The vectorized CQUAD4 stress table extractor, checked against the
+           line by line reader on output written by fake_nastran.py.
+"""
+import os
+import pickle
+import sys
+import pytest
+from numpy import allclose, array
+from pyequalizer.fileops import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_nastran
+
+_cases = [(1, 1000., 200., True), (2, -30., 500., True)]
+
+def write_f06(path, cases = _cases, n = 120, newline = None, edit = None):
+    elements = [[e, 1 + e % 3] for e in range(1, n + 1)]
+    lines = fake_nastran.f06_lines(cases, elements, {1: 1., 2: 2., 3: 3.})
+    if edit is not None:
+        lines = edit(lines)
+    with open(path, 'w', newline = newline) as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+def line_by_line(fname):
+    """
+    [eid, sx, sy, txy, von mises] of every stress row, read one line at a time.
+    """
+    rows = []
+    def collect(line, loc, retval):
+        eid = line[1:9]
+        rows.append([int(eid) if eid.strip() else rows[-1][0], float(line[30:43]),
+            float(line[45:58]), float(line[60:73]), to_von_mises(line[87:100], line[103:116])])
+        return retval
+    act_on_stress_lines(fname, collect)
+    return array(rows)
+
+@pytest.mark.parametrize("newline", [None, "\r\n"])
+def test_table_matches_line_by_line(tmp_path, newline):
+    fname = write_f06(tmp_path / "job.f06", newline = newline)
+    table = read_stress_table(fname)
+    expect = line_by_line(fname)
+    assert len(table) == len(expect) == 2 * 120 * 10
+    assert (table.eid == expect[:, 0]).all()
+    assert allclose(table.sx, expect[:, 1]) and allclose(table.sy, expect[:, 2])
+    assert allclose(table.txy, expect[:, 3]) and allclose(table.von_mises, expect[:, 4])
+    assert max_cquad_stress(fname) == pytest.approx(expect[:, 4].max())
+    assert table.center.sum() == 2 * 120
+    assert set(table.fibre) == {-0.5, 0.5}
+
+def test_blocks_and_subcases(tmp_path):
+    data = open(write_f06(tmp_path / "job.f06"), 'rb').read()
+    blocks = find_stress_blocks(data)
+    # 50 rows to a page: 1200 rows per subcase make 24 blocks each.
+    assert [b[0] for b in blocks] == [1] * 24 + [2] * 24
+    assert all(len(b[1]) == 50 for b in blocks)
+
+def test_unlabelled_blocks_are_subcase_one(tmp_path):
+    data = open(write_f06(tmp_path / "job.f06", [(1, 10., 10., False)]), 'rb').read()
+    assert set(b[0] for b in find_stress_blocks(data)) == {1}
+
+def test_block_ends_on_line_without_numbers(tmp_path):
+    def trailer(lines):
+        # Drop the last PAGE line so the table runs into plain text.
+        return lines[:-1] + [" ", "   END OF JOB"]
+    fname = write_f06(tmp_path / "job.f06", [(1, 10., 10., False)], n = 3, edit = trailer)
+    assert len(read_stress_table(fname)) == 30
+
+def test_short_lines_are_padded(tmp_path):
+    def strip(lines):
+        return [l.rstrip() for l in lines]
+    full = read_stress_table(write_f06(tmp_path / "a.f06"))
+    short = read_stress_table(write_f06(tmp_path / "b.f06", edit = strip))
+    assert allclose(full.von_mises, short.von_mises)
+
+def test_element_filter(tmp_path):
+    data = open(write_f06(tmp_path / "job.f06"), 'rb').read()
+    starts, lens = find_stress_rows(data, {3, 50, 117})
+    table = stress_table.from_lines(data, starts, lens)
+    assert list(table.center_eids) == [3, 50, 117, 3, 50, 117]
+    assert len(table) == 60
+    whole = stress_table.from_lines(data, *find_stress_rows(data))
+    assert allclose(table.sx, whole.sx[(whole.eid == 3) | (whole.eid == 50) | (whole.eid == 117)])
+
+def test_rows_and_pickle(tmp_path):
+    table = read_stress_table(write_f06(tmp_path / "job.f06"))
+    part = table.rows(1200, 1210)
+    assert (part.eid == 1).all() and allclose(part.sx, table.sx[1200:1210])
+    copy = pickle.loads(pickle.dumps(table))
+    assert copy._data is None
+    assert allclose(copy.rows(1200, 1210).minor, part.minor)
+
+def test_from_strings():
+    assert len(stress_table([])) == 0
+    lines = fake_nastran.stress_rows([[7, 1]], {1: 2.}, 100., 0.)
+    table = stress_table(lines)
+    assert list(table.eid) == [7] * 10 and table.loc[1] == b'       7'
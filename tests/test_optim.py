@@ -0,0 +1,24 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Optim
+  Purpose: Construction of systems from a base deck.
+"""
+import os
+import pytest
+from pyequalizer import system, cost_mass
+
+_model = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "models", "test_open.dat")
+
+def test_base_props_list_is_an_editable_copy():
+    s = system(0, _model, 1, 2, [cost_mass], [])
+    with pytest.raises(TypeError):
+        s.base_props[0][3] = "1.0"
+    props = s.base_props_list()
+    props[0][3] = "1.0"
+    assert props[0] == ["PSHELL"] + list(s.base_props[0][1:3]) + ["1.0"] + list(s.base_props[0][4:])
+    assert s.base_props[0][3] != "1.0"
+    pop = s.make_population([props])
+    assert pop.x[0][0] == 1.0
@@ -0,0 +1,97 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Pareto
+  Purpose: Front extraction, non-dominated sorting and the pareto archive,
+           checked against pair by pair reference implementations.
+"""
+import pytest
+from numpy import array, inf
+from numpy.random import default_rng
+from pyequalizer import pareto
+from pyequalizer.pareto import *
+
+def weakly_dominated_ref(F):
+    n = len(F)
+    return [any(j != i and (F[j] <= F[i]).all() for j in range(n)) for i in range(n)]
+
+def ranks_ref(F):
+    """
+    Peel fronts one at a time under strict dominance.
+    """
+    left = set(range(len(F)))
+    ranks = [None] * len(F)
+    r = 0
+    while left:
+        front = [i for i in left if not any((F[j] <= F[i]).all() and (F[j] < F[i]).any()
+            for j in left)]
+        for i in front:
+            ranks[i] = r
+        left -= set(front)
+        r += 1
+    return ranks
+
+def fitness(k, n = 60, seed = 0):
+    # Rounded so that ties and exact duplicates occur.
+    return default_rng(seed).integers(0, 6, (n, k)).astype(float)
+
+@pytest.fixture
+def small_chunk(monkeypatch):
+    monkeypatch.setattr(pareto, '_chunk', 7)
+
+@pytest.mark.parametrize("k", [2, 3, 4])
+def test_weakly_dominated(k, small_chunk):
+    for seed in range(5):
+        F = fitness(k, seed = seed)
+        assert list(weakly_dominated(F)) == weakly_dominated_ref(F)
+        assert list(pareto_mask(F)) == [not d for d in weakly_dominated_ref(F)]
+
+@pytest.mark.parametrize("k", [2, 3, 4])
+def test_non_dominated_sort(k, small_chunk):
+    for seed in range(5):
+        F = fitness(k, seed = seed)
+        assert list(non_dominated_sort(F)) == ranks_ref(F)
+
+def test_empty_and_single():
+    assert len(non_dominated_sort(array([]).reshape(0, 3))) == 0
+    assert list(non_dominated_sort(array([[1., 2., 3.]]))) == [0]
+    assert len(weakly_dominated(array([]).reshape(0, 2))) == 0
+
+def test_duplicates():
+    F = array([[1., 1., 1.], [1., 1., 1.], [2., 2., 2.]])
+    assert list(weakly_dominated(F)) == [True, True, True]
+    assert list(non_dominated_sort(F)) == [0, 0, 1]
+
+def test_crowding_distance():
+    F = array([[0., 4.], [1., 3.], [2., 1.], [4., 0.]])
+    d = crowding_distance(F)
+    assert d[0] == inf and d[3] == inf
+    assert d[1] == pytest.approx(2 / 4 + 3 / 4)
+    assert d[2] == pytest.approx(3 / 4 + 3 / 4)
+
+class item(object):
+    def __init__(self, fitness):
+        self.fitness = fitness
+
+@pytest.mark.parametrize("k", [2, 3])
+def test_archive_matches_front(k):
+    F = fitness(k, n = 80, seed = 3)
+    archive = pareto_archive()
+    for lo in range(0, 80, 20):
+        archive.update([item(list(f)) for f in F[lo:lo + 20]])
+    # Exact duplicates drop each other from the front, but the archive keeps the first.
+    got = sorted(tuple(m.fitness) for m in archive)
+    expect = sorted(set(tuple(f) for f in F if not any(
+        (g <= f).all() and (g != f).any() for g in F)))
+    assert got == expect
+
+def test_archive_counts_and_capacity():
+    archive = pareto_archive(capacity = 3)
+    archive.update([item([float(i), 10. - i]) for i in range(6)])
+    assert len(archive) == 3 and archive.added == 3 and archive.rejected == 0
+    kept = sorted(m.fitness[0] for m in archive)
+    assert kept[0] == 0. and kept[-1] == 5.
+    archive.update([item([-1., -1.]), item([0., 20.])])
+    assert [m.fitness for m in archive] == [[-1., -1.]]
+    assert archive.added == 1 and archive.removed == 3 and archive.rejected == 1
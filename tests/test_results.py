@@ -0,0 +1,78 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Results
+  Purpose: f06_result parsing of fake_nastran.py output, and the fitness and
+           constraint functions that share it.
+"""
+import os
+import pickle
+import sys
+import pytest
+from numpy import allclose
+from pyequalizer import cost_mass, cost_stress, const_beta, const_mass
+from pyequalizer.results import read_f06, f06_result, _failed_value
+from pyequalizer.fileops import max_cquad_stress, mass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_nastran
+
+_elements = [[e, 1 + e % 3] for e in range(1, 41)]
+_thickness = {1: 1., 2: 2., 3: 4.}
+
+def write_f06(path, cases = [(1, 1000., 200., False)], extra = []):
+    lines = fake_nastran.f06_lines(cases, _elements, _thickness) + extra
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+def test_read_f06(tmp_path):
+    fname = write_f06(tmp_path / "job.dat.out")
+    r = read_f06(fname)
+    assert r.ok and not r.fatal and r.found
+    assert r.mass == pytest.approx(7. * fake_nastran._density) == mass(fname)
+    assert r.max_stress == pytest.approx(max_cquad_stress(fname))
+    assert r.max_stress == pytest.approx(float(r.table.von_mises.max()))
+    assert list(r.element_ids) == list(range(1, 41))
+    assert r.voigt.shape == (40, 3)
+    assert r.subcases == {1: (0, 400)}
+
+def test_subcases(tmp_path):
+    r = read_f06(write_f06(tmp_path / "job.dat.out",
+        [(1, 1000., 0., True), (2, 0., 1000., True)]))
+    assert r.subcases == {1: (0, 400), 2: (400, 800)}
+    x, y = r.subcase_table(1), r.subcase_table(2)
+    assert len(x) == len(y) == 400 and not allclose(x.sx, y.sx)
+    assert len(r.subcase_table(3)) == 0
+
+def test_element_filter(tmp_path):
+    fname = write_f06(tmp_path / "job.dat.out")
+    whole = read_f06(fname)
+    r = read_f06(fname, {2, 5, 40})
+    assert list(r.element_ids) == [2, 5, 40]
+    keep = [i for i, e in enumerate(whole.element_ids) if e in (2, 5, 40)]
+    assert allclose(r.voigt, whole.voigt[keep])
+    assert r.max_stress <= whole.max_stress
+
+def test_missing_and_fatal(tmp_path, capsys):
+    r = read_f06(str(tmp_path / "nope.out"))
+    assert not r.ok and not r.found
+    assert r.mass == r.max_stress == _failed_value
+    fatal = read_f06(write_f06(tmp_path / "job.dat.out", extra = ["*** USER FATAL MESSAGE 9050"]))
+    assert fatal.fatal and not fatal.ok and fatal.mass == _failed_value
+
+def test_fitness_functions_share_results(tmp_path):
+    light = read_f06(write_f06(tmp_path / "a.out", [(1, 10., 10., False)]))
+    heavy = read_f06(write_f06(tmp_path / "b.out", [(1, 1e6, 1e6, False)]))
+    results = [light, heavy]
+    assert cost_mass(results) == [light.mass, heavy.mass]
+    assert cost_stress(results) == [light.max_stress, heavy.max_stress]
+    beta = const_beta(results)
+    assert beta[0] == 0 and beta[1] > 0
+    assert const_mass(results) == [0, 0]
+
+def test_pickle(tmp_path):
+    r = read_f06(write_f06(tmp_path / "job.dat.out"))
+    copy = pickle.loads(pickle.dumps(r))
+    assert copy.mass == r.mass and copy.max_stress == r.max_stress
+    assert allclose(copy.voigt, r.voigt)
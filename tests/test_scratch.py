@@ -0,0 +1,71 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Scratch
+  Purpose: Creation and removal of scratch_space run directories.
+"""
+import gc
+import os
+import pickle
+from pyequalizer import system, cost_mass, validate_inds, read_force, load_from_file
+from pyequalizer.scratch import scratch_space
+
+_model = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "models", "test_open.dat")
+
+def runs(root):
+    return sorted(os.listdir(str(root))) if root.exists() else []
+
+def test_run_directory_made_on_first_use(tmp_path):
+    s = scratch_space(str(tmp_path))
+    s.release(0, 0)
+    assert runs(tmp_path) == []
+    [deck] = s.deck_names(0, 0, 1)
+    assert deck.startswith(s.path) and len(runs(tmp_path)) == 1
+    s.cleanup()
+    assert runs(tmp_path) == []
+
+def test_removed_when_collected(tmp_path):
+    s = scratch_space(str(tmp_path))
+    s.deck_names(0, 0, 2)
+    copy = pickle.loads(pickle.dumps(s))
+    assert copy.path == s.path
+    del copy
+    gc.collect()
+    assert len(runs(tmp_path)) == 1 # A copy does not remove the directory.
+    del s
+    gc.collect()
+    assert runs(tmp_path) == []
+
+def test_keep(tmp_path):
+    s = scratch_space(str(tmp_path), keep = True)
+    s.deck_names(0, 0, 1)
+    s.cleanup()
+    del s
+    gc.collect()
+    assert len(runs(tmp_path)) == 1
+
+def test_system_without_scratch_leaves_nothing(tmp_path):
+    root = tmp_path / "nastran"
+    systems = [system(x, _model, 1, 2, [cost_mass], [], prefix = str(root / "optim"))
+            for x in range(3)]
+    assert runs(root) == []
+    systems[0].deck_names(2)
+    assert len(runs(root)) == 1
+    del systems
+    gc.collect()
+    assert runs(root) == []
+
+def test_validation_has_its_own_scratch(tmp_path):
+    binary = os.path.join(os.path.dirname(_model), "..", "fake_nastran.py")
+    run = scratch_space(str(tmp_path), keep = True)
+    marker = os.path.join(run.job_dir(99, 0, 0), "marker")
+    open(marker, "w").close()
+    s = system(0, _model, 1, 3, [cost_mass], [], binary = binary, scratch = run, seed = 1)
+    inds = s.first_generation()
+    force = read_force(load_from_file(_model))
+    valid = validate_inds(inds, force, _model, 1e9, 1e9, binary = binary, scratch = run)
+    assert len(valid) == 3
+    assert os.listdir(os.path.dirname(marker)) == ["marker"]
+    assert len(runs(tmp_path)) == 2 # The run's directory, and the validation one kept with it.
@@ -0,0 +1,91 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Stochastic
+  Purpose: stochastic_von_mises and its stochastic_pool, checked against the
+           per-element 3x3 formulas of tensor_ind.apply_stochastic_force.
+"""
+from multiprocessing import get_context
+from numpy import allclose, argmin
+from numpy.random import default_rng
+from pyequalizer.stochastic import stochastic_von_mises, stochastic_pool, deviators
+from pyequalizer.nr_var import nr_var
+from pyequalizer.math_utils import calc_beta
+
+_loads = (0., 5000., 150000., 19500.)
+
+def stacks(n_ind, n_elem, seed = 0):
+    rng = default_rng(seed)
+    out = []
+    for i in range(2):
+        t = rng.normal(0, 1, (n_ind, n_elem, 3, 3))
+        out.append(deviators(t + t.swapaxes(-1, -2)))
+    return out
+
+def per_element(sd_x, sd_y, mu_x, sigma_x, mu_y, sigma_y):
+    """
+    Mean and standard deviation of von Mises stress for one element, written
+    the way tensor_ind.apply_stochastic_force computed it before batching.
+    """
+    alpha = ((sd_x@sd_x)*mu_x**2 + ((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_x * mu_y
+            + (sd_y @ sd_y) * mu_y**2).trace()
+    fd_alpha_px = ((sd_x@sd_x)*2*mu_x + ((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_y).trace()
+    sd_alpha_px = ((sd_x@sd_x)*2).trace()
+    fd_alpha_py = (((sd_x @ sd_y) + (sd_y @ sd_x)) * mu_x + (sd_y @ sd_y) * 2 * mu_y).trace()
+    sd_alpha_py = ((sd_y @ sd_y) * 2).trace()
+
+    s_vm = (3/2*alpha)**0.5
+    fd_svm_px = (3/2)**0.5 * ((1/2) * (alpha)**-0.5 * fd_alpha_px)
+    sd_svm_px = ((3/2)**0.5 * (((1/2) * sd_alpha_px * (alpha)**-0.5) +
+        ((-1/4) * (alpha)**(-3/2) * fd_alpha_px**2)))
+    fd_svm_py = (3/2)**0.5 * ((1/2) * (alpha)**-0.5 * fd_alpha_py)
+    sd_svm_py = ((3/2)**0.5 * (((1/2) * sd_alpha_py * (alpha)**-0.5) +
+        ((-1/4) * (alpha)**(-3/2) * fd_alpha_py**2)))
+
+    E_svm = s_vm + (1/2) * (sd_svm_px * sigma_x**2 + sd_svm_py * sigma_y**2)
+    sigma_svm = (((fd_svm_px * sigma_x)**2) + ((fd_svm_py * sigma_y)**2) +
+            ((1/4) * ((sd_svm_px * sigma_x**2)**2 + (sd_svm_py * sigma_y**2)**2)))**0.5
+    return nr_var(E_svm, sigma_svm)
+
+def test_matches_per_element():
+    sd_x, sd_y = stacks(7, 11, seed = 2)
+    E_svm, sigma_svm = stochastic_von_mises(sd_x, sd_y, *_loads)
+    assert E_svm.shape == sigma_svm.shape == (7, 11)
+    for i in range(7):
+        for e in range(11):
+            ref = per_element(sd_x[i, e], sd_y[i, e], *_loads)
+            assert allclose(E_svm[i, e], ref.mu, rtol = 1e-12)
+            assert allclose(sigma_svm[i, e], ref.sigma, rtol = 1e-12)
+
+def test_min_beta_matches_per_element():
+    sd_x, sd_y = stacks(7, 11, seed = 3)
+    strength = nr_var(248.211, 248.211*0.13)
+    # Loads scaled so the betas spread either side of zero.
+    loads = [l * 1e-3 for l in _loads]
+    betas = calc_beta(nr_var(*stochastic_von_mises(sd_x, sd_y, *loads)), strength)
+    worst = argmin(betas, axis=1)
+    for i in range(7):
+        ref = min([calc_beta(per_element(sd_x[i, e], sd_y[i, e], *loads), strength)
+            for e in range(11)])
+        assert allclose(float(betas[i, worst[i]]), ref, rtol = 1e-12)
+
+def run_in_pool(n_ind):
+    sd_x, sd_y = stacks(n_ind, 4)
+    with stochastic_pool(2, min_rows = 1) as pool:
+        return pool.run(sd_x, sd_y, *_loads)
+
+def test_pool_matches_in_process():
+    sd_x, sd_y = stacks(40, 4)
+    with stochastic_pool(2, min_rows = 1) as pool:
+        got = pool.run(sd_x, sd_y, *_loads)
+    expect = stochastic_von_mises(sd_x, sd_y, *_loads)
+    assert allclose(got[0], expect[0]) and allclose(got[1], expect[1])
+
+def test_pool_in_daemonic_worker():
+    # optimize_systems runs systems in daemonic Pool workers, which may not start processes.
+    with get_context("fork").Pool(1) as outer:
+        got = outer.apply(run_in_pool, (40,))
+    sd_x, sd_y = stacks(40, 4)
+    expect = stochastic_von_mises(sd_x, sd_y, *_loads)
+    assert allclose(got[0], expect[0]) and allclose(got[1], expect[1])
@@ -0,0 +1,116 @@
+# *********************
+# *     PyStruct      *
+# *********************
+"""
+ Module: Test Surrogate
+  Purpose: gp_surrogate scoring, and the screened trial generation of systems
+           that use it, driven by fake_nastran.py.
+"""
+import os
+import random
+import numpy
+import pytest
+from numpy import allclose, array, ones, zeros
+from numpy.random import default_rng
+import pyequalizer as pe
+from pyequalizer.surrogate import gp_surrogate, _signed_log
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_model = os.path.join(_root, "models", "test_open.dat")
+_binary = os.path.join(_root, "fake_nastran.py")
+
+def test_predict_fits_observations():
+    rng = default_rng(0)
+    x = rng.uniform(0, 10, (30, 3))
+    y = numpy.stack([x.sum(axis = 1), (x**2).sum(axis = 1)], axis = 1)
+    s = gp_surrogate()
+    s.observe(x, y)
+    mean, sd = s.predict(x)
+    assert mean.shape == sd.shape == (30, 2)
+    assert allclose(mean, _signed_log(y), atol = 1e-3)
+
+def test_solves_everything_until_min_points():
+    s = gp_surrogate(threshold = 2., min_points = 5)
+    s.observe(ones((4, 2)), ones((4, 1)))
+    assert s.screen(ones((3, 2)), ones((3, 1)), default_rng(0)).all()
+    assert s.record(ones((3, 1)), [True, False, True]) is None
+    assert s.history == []
+
+def test_record_counts():
+    s = gp_surrogate()
+    predicted = array([[0.], [1.], [2.], [3.], [4.]])
+    promising = array([True, True, False, False, True])
+    explored = array([False, False, True, False, False])
+    s._pending = (predicted, promising, explored)
+    # Trials 0, 1, 2 and 4 are solved; 0 and 2 win.
+    solved = numpy.expm1(array([[0.5], [1.], [2.], [3.]]))
+    entry = s.record(solved, [True, False, True, False])
+    assert entry == s.history[-1]
+    assert entry['trials'] == 5 and entry['solved'] == 4 and entry['skipped'] == 1
+    assert entry['explored'] == 1 and entry['predicted_wins'] == 3 and entry['actual_wins'] == 2
+    # Predicted [win, win, lose, win] against [win, lose, win, lose].
+    assert entry['correct'] == 1
+    assert entry['mae'] == pytest.approx((0.5 + 0. + 0. + 1.) / 4)
+
+def test_record_nothing_solved():
+    s = gp_surrogate()
+    s._pending = (zeros((3, 2)), zeros(3, dtype = bool), zeros(3, dtype = bool))
+    entry = s.record(zeros((0, 2)), zeros(0, dtype = bool))
+    assert entry['solved'] == 0 and entry['skipped'] == 3
+    assert entry['correct'] == entry['actual_wins'] == 0 and entry['mae'] == 0.
+
+def make(kind, tmp_path, surrogate):
+    random.seed(1)
+    numpy.random.seed(1)
+    scratch = pe.scratch_space(str(tmp_path / "scratch"))
+    if kind == "unit":
+        return pe.system_unit(1, _model, 1, 6, pe.test_open_force_pack(1,1000,0,0),
+                pe.test_open_force_pack(1,0,1000,0), pe.nr_var(0,5000), pe.nr_var(150000,19500),
+                binary = _binary, scratch = scratch, seed = 3, surrogate = surrogate)
+    return pe.system(0, _model, 1, 6, [pe.cost_mass, pe.cost_stress],
+            [pe.const_beta, pe.const_mass], binary = _binary, scratch = scratch, seed = 1,
+            surrogate = surrogate)
+
+@pytest.mark.parametrize("kind", ["plain", "unit"])
+def test_everything_screened_out(tmp_path, monkeypatch, kind):
+    s = make(kind, tmp_path, gp_surrogate(threshold = 2., explore = 0., min_points = 2))
+    first = s.first_generation()
+    def no_solve(*args):
+        raise AssertionError("nothing should be solved")
+    monkeypatch.setattr(s, "run_generation", no_solve)
+    gen = s.generation
+    out = s.trial_generation(first)
+    assert (out.x == first.x).all() and (out.fitness == first.fitness).all()
+    assert s.generation == gen + 1
+    entry = s.surrogate.history[-1]
+    assert entry['solved'] == 0 and entry['skipped'] == 6
+
+@pytest.mark.parametrize("kind", ["plain", "unit"])
+def test_solved_trials_line_up_with_parents(tmp_path, monkeypatch, kind):
+    s = make(kind, tmp_path, gp_surrogate(min_points = 2))
+    first = s.first_generation()
+    mask = array([True, False, False, True, True, False])
+    monkeypatch.setattr(s.surrogate, "screen", lambda x, parent_fitness, rng: mask)
+    out = s.trial_generation(first)
+    assert (out.x[~mask] == first.x[~mask]).all()
+    assert (out.fitness[~mask] == first.fitness[~mask]).all()
+    for i in range(6):
+        # Each individual, solved or kept, carries its own design and fitness.
+        ind = out[i]
+        assert ind.props == out.props(i)
+        assert allclose(ind.fitness, out.fitness[i])
+        if kind == "unit" and not mask[i]:
+            assert ind is first.members[i]
+    assert len(s.surrogate) == 6 + 3
+
+def test_history_matches_selection(tmp_path):
+    s = make("plain", tmp_path, gp_surrogate(threshold = 0.5, explore = 0., min_points = 2))
+    last = s.first_generation()
+    for _ in range(3):
+        out = s.trial_generation(last)
+        entry = s.surrogate.history[-1]
+        assert entry['solved'] + entry['skipped'] == 6
+        assert entry['actual_wins'] == int((out.x != last.x).any(axis = 1).sum())
+        assert 0 <= entry['correct'] <= entry['solved']
+        last = out
+    assert len(s.surrogate.history) == 3